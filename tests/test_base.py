@@ -8,7 +8,6 @@ from os import path
 
 from trafficgenerator.test.test_tgn import TestTgnBase
 from xenavalkyrie.xena_app import init_xena
-from xenavalkyrie.xena_stream import XenaStream
 
 
 class TestXenaBase(TestTgnBase):
@@ -23,7 +22,6 @@ class TestXenaBase(TestTgnBase):
         self.xm.session.add_chassis(self.chassis)
         if self.chassis2:
             self.xm.session.add_chassis(self.chassis2)
-        XenaStream.next_tpld_id = 0
 
     def teardown(self):
         self.xm.session.disconnect()
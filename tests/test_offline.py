@@ -14,7 +14,7 @@ from pypacker.layer4.tcp import TCP
 from pypacker.layer4.udp import UDP
 
 from trafficgenerator.tgn_utils import ApiType, is_local_host
-from xenavalkyrie.xena_stream import XenaModifierType, XenaModifierAction
+from xenavalkyrie.xena_stream import XenaModifierType, XenaModifierAction, XenaStreamState
 from xenavalkyrie.xena_stream import XenaStream
 from xenavalkyrie.xena_filter import XenaFilterState
 from .test_base import TestXenaBase
@@ -44,7 +44,10 @@ class TestXenaOffline(TestXenaBase):
         port.load_config(path.join(path.dirname(__file__), 'configs', 'test_config_1.xpc'))
 
         assert(len(port.streams) == 2)
-        assert(XenaStream.next_tpld_id == 2)
+        assert(port.session.tpld_ids.is_used(0) and port.session.tpld_ids.is_used(1))
+        assert(port.streams[1].name == 'Stream 1-2')
+        assert(port.streams[1].tpld_id == 1)
+        assert(port.streams[1].state == XenaStreamState.enabled)
 
         packet = port.streams[0].get_packet_headers()
         print(packet)
@@ -88,6 +91,27 @@ class TestXenaOffline(TestXenaBase):
         port.streams[0].remove_modifier(0)
         assert(port.streams[0].modifiers[0].max_val == 65535)
 
+        port.streams[0].insert_modifier(0, position=8, max_val=100)
+        port.streams[0].insert_modifier(1, position=10, action=XenaModifierAction.random)
+        port.streams[0].update_modifier(2, max_val=200)
+        port.streams[0].del_objects_by_type('modifier')
+        assert([m.position for _, m in sorted(port.streams[0].modifiers.items())] == [8, 10, 12])
+        assert(port.streams[0].modifiers[0].max_val == 100)
+        assert(port.streams[0].modifiers[1].action == XenaModifierAction.random)
+        assert(port.streams[0].modifiers[2].max_val == 200)
+        port.streams[0].remove_modifier(1)
+        port.streams[0].del_objects_by_type('modifier')
+        assert([m.position for _, m in sorted(port.streams[0].modifiers.items())] == [8, 12])
+
+        for index in (-1, 3):
+            with pytest.raises(IndexError):
+                port.streams[0].insert_modifier(index, position=16)
+        for index in (-1, 2):
+            with pytest.raises(IndexError):
+                port.streams[0].remove_modifier(index)
+        port.streams[0].del_objects_by_type('modifier')
+        assert([m.position for _, m in sorted(port.streams[0].modifiers.items())] == [8, 12])
+
     def test_extended_modifiers(self):
         try:
             port = self.xm.session.reserve_ports([self.port3])[self.port3]
@@ -107,9 +131,17 @@ class TestXenaOffline(TestXenaBase):
         assert(modifier2.position == 12)
         print(modifier2)
 
+        # Inserted modifier values that are not set are the extended modifier chassis defaults.
+        modifier3 = port.streams[0].insert_modifier(0, m_type=XenaModifierType.extended, position=16)
+        port.streams[0].del_objects_by_type('xmodifier')
+        modifier2, modifier3 = port.streams[0].xmodifiers[1], port.streams[0].xmodifiers[0]
+        assert((modifier2.position, modifier3.position) == (12, 16))
+        assert((modifier3.mask, modifier3.max_val) == (modifier2.mask, modifier2.max_val))
+
         port.streams[0].remove_modifier(0)
         assert(len(port.streams[0].modifiers) == 0)
-        assert(len(port.streams[0].xmodifiers) == 1)
+        assert(len(port.streams[0].xmodifiers) == 2)
+        port.streams[0].remove_modifier(0, m_type=XenaModifierType.extended)
         port.streams[0].remove_modifier(0, m_type=XenaModifierType.extended)
         assert(len(port.streams[0].xmodifiers) == 0)
 
@@ -118,21 +150,26 @@ class TestXenaOffline(TestXenaBase):
         #: :type port: xenavalkyrie.xena_port.XenaPort
         port = self.xm.session.reserve_ports([self.port1], force=False, reset=True)[self.port1]
 
-        assert(XenaStream.next_tpld_id == 0)
+        assert(not port.session.tpld_ids.is_used(0))
         assert(len(port.streams) == 0)
         assert(port.get_attribute('ps_indices') == '')
 
         stream = port.add_stream('first stream')
         assert(stream.get_attribute('ps_comment') == 'first stream')
         assert(stream.get_attribute('ps_tpldid') == '0')
-        assert(XenaStream.next_tpld_id == 1)
+        assert(port.session.tpld_ids.is_used(0))
         assert(len(port.streams) == 1)
 
         stream = port.add_stream(tpld_id=7)
         assert(stream.get_attribute('ps_tpldid') == '7')
-        assert(XenaStream.next_tpld_id == 8)
+        assert(port.session.tpld_ids.is_used(7))
         assert(len(port.streams) == 2)
 
+        stream = port.add_stream()
+        assert(stream.get_attribute('ps_tpldid') == '1')
+        port.remove_stream(2)
+        assert(not port.session.tpld_ids.is_used(1))
+
         if self.api == ApiType.rest:
             return
 
@@ -166,6 +203,19 @@ class TestXenaOffline(TestXenaBase):
 
         port.save_config(path.join(path.dirname(__file__), 'configs', 'save_config.xpc'))
 
+    def test_tpld_ids(self):
+        ports = self.xm.session.reserve_ports([self.port1, self.port2], force=False, reset=True)
+        tpld_ids = self.xm.session.tpld_ids
+
+        stream1 = ports[self.port1].add_stream(tpld_id=5)
+        stream2 = ports[self.port2].add_stream(tpld_id=5)
+        assert(ports[self.port2].add_stream().tpld_id == 0)
+        ports[self.port1].remove_stream(stream1.id)
+        assert(tpld_ids.is_used(5))
+        ports[self.port2].remove_stream(stream2.id)
+        assert(not tpld_ids.is_used(5))
+        assert(tpld_ids.is_used(0))
+
     def test_rest_server(self):
 
         if self.api == ApiType.rest:
@@ -255,3 +305,33 @@ class TestXenaOffline(TestXenaBase):
         resulting_headers = udp_stream.get_packet_headers()
         l4 = resulting_headers.upper_layer.upper_layer
         assert l4.sum == 0
+
+    def test_packet_headers_cache(self):
+
+        #: :type port: xenavalkyrie.xena_port.XenaPort
+        port = self.xm.session.reserve_ports([self.port1], force=False, reset=True)[self.port1]
+
+        headers = Ethernet(src_s='22:22:22:22:22:22') + IP() + UDP()
+        streams = [port.add_stream('stream {}'.format(i)) for i in range(4)]
+        for stream in streams:
+            stream.set_packet_headers(headers, l4_checksum=True)
+        assert((headers.bin(), True) in XenaStream._encoded_headers)
+        for stream in streams:
+            assert(stream.get_attribute('ps_headerprotocol').lower() == 'ethernet ip udpcheck')
+            assert(stream.get_packet_headers().src_s == '22:22:22:22:22:22')
+
+    def test_preview_packet_headers(self):
+        pytest.importorskip('numpy')
+
+        #: :type port: xenavalkyrie.xena_port.XenaPort
+        port = self.xm.session.reserve_ports([self.port1], force=False, reset=True)[self.port1]
+        stream = port.add_stream('preview stream')
+        stream.set_packet_headers(Ethernet(src_s='22:22:22:22:22:22') + IP() + UDP())
+        stream.add_modifier(position=34, min_val=10, step=2, max_val=20)
+        stream.add_modifier(position=36, action=XenaModifierAction.decrement, min_val=0, max_val=3, repeat=2)
+
+        headers = stream.preview_packet_headers()
+        assert(headers.shape[0] == 24)
+        assert([h[34] * 256 + h[35] for h in headers[:4]] == [10, 12, 14, 16])
+        assert([h[36] * 256 + h[37] for h in headers[:4]] == [3, 3, 2, 2])
+        assert(stream.preview_packet_headers(num_packets=1000).shape[0] == 1000)
@@ -11,11 +11,15 @@ from os import path
 import json
 import binascii
 import time
+import pytest
 
 from pypacker.layer12 import ethernet
 
 from xenavalkyrie.xena_statistics_view import XenaPortsStats, XenaStreamsStats, XenaTpldsStats
+from xenavalkyrie.xena_statistics_delta import XenaStatsDelta
+from xenavalkyrie.api.xena_socket import XenaCommandError
 from xenavalkyrie.xena_port import XenaCaptureBufferType
+from xenavalkyrie.xena_capture_store import XenaCaptureStore
 from xenavalkyrie.xena_tshark import Tshark, TsharkAnalyzer
 from .test_base import TestXenaBase
 
@@ -62,6 +66,61 @@ class TestXenaOnline(TestXenaBase):
         print(tplds_stats.statistics.dumps())
         print(json.dumps(tplds_stats.get_flat_stats(), indent=1))
 
+    def test_stats_snapshot(self):
+        ports = self.xm.session.reserve_ports([self.port1, self.port2])
+        chassis = self.xm.session.chassis_list[self.chassis]
+
+        self.xm.session.clear_stats()
+        ports_stats = chassis.read_ports_stats()
+        assert(len(ports_stats) == 2)
+        assert(list(ports_stats[ports[self.port1]].keys()) == list(ports[self.port1].stats_captions.keys()))
+        assert(ports_stats[self.port2]['pt_total']['packets'] == 0)
+        ports_stats = chassis.read_ports_stats(ports[self.port1], captions={'pt_total': ['packets']})
+        assert(list(ports_stats.keys()) == [ports[self.port1]])
+        assert(ports_stats[self.port1] == {'pt_total': {'packets': 0}})
+
+        ports_stats = XenaPortsStats(self.xm.session)
+        ports_stats.read_stats()
+        assert(ports_stats.timestamp)
+        assert(ports_stats.statistics[self.port1]['pr_total']['packets'] == 0)
+
+        ports_stats = XenaPortsStats(self.xm.session, ['pr_total', 'pt_total_packets'])
+        ports_stats.read_stats()
+        assert(list(ports_stats.statistics[self.port1].keys()) == ['pr_total', 'pt_total'])
+        assert(list(ports_stats.get_flat_stats()[self.port2].keys()) == ports_stats.get_flat_captions())
+        assert(ports_stats.get_flat_captions()[-1] == 'pt_total_packets')
+
+    def test_stats_poller(self):
+        port = self.xm.session.reserve_ports([self.port1])[self.port1]
+        port.load_config(path.join(path.dirname(__file__), 'configs', 'test_config_loopback.xpc'))
+
+        ports_stats = XenaPortsStats(self.xm.session)
+        samples = []
+        poller = self.xm.session.start_stats_poller([ports_stats], interval=0.5, size=4)
+        poller.subscribe(lambda timestamp, sample: samples.append(sample))
+        self.xm.session.start_traffic()
+        time.sleep(3)
+        self.xm.session.stop_traffic()
+        poller.stop()
+        assert(poller not in self.xm.session.stats_pollers)
+
+        assert(len(samples) >= 5)
+        assert(len(poller.buffer) == 4)
+        timestamp, sample = poller.latest()
+        assert(sample[ports_stats][port]['pt_total']['packets'] > 0)
+
+    def test_multi_commands_errors(self):
+        port = self.xm.session.reserve_ports([self.port1], reset=True)[self.port1]
+        stream = port.add_stream('stream')
+
+        with pytest.raises(XenaCommandError) as e:
+            port.api.send_multi_commands([(stream, 'ps_ratepps', [10]), (stream, 'ps_ratepps', ['bad']),
+                                          (stream, 'ps_packetlimit', [5])])
+        assert('- [1] ' in str(e.value) and '- [0] ' not in str(e.value))
+        # The connection is still in sync.
+        assert(stream.get_attribute('ps_packetlimit') == '5')
+        assert(port.api.get_multi_attributes([(stream, 'ps_ratepps'), (stream, 'ps_packetlimit')]) == ['10', '5'])
+
     def test_stream_stats(self):
         """ For this test we need back-to-back ports. """
         ports = self.xm.session.reserve_ports([self.port1, self.port2])
@@ -88,6 +147,29 @@ class TestXenaOnline(TestXenaBase):
         assert(streams_stats.statistics['Stream 1-1']['rx'][ports[self.port2]]['pr_tpldtraffic']['pac'] == 8000)
         assert(streams_stats.statistics['Stream 1-1']['rx'][self.port2]['pr_tpldtraffic']['pac'] == 8000)
 
+    def test_stats_delta(self):
+        """ For this test we need back-to-back ports. """
+        ports = self.xm.session.reserve_ports([self.port1, self.port2])
+        ports[self.port1].load_config(path.join(path.dirname(__file__), 'configs', 'test_config_1.xpc'))
+        ports[self.port2].load_config(path.join(path.dirname(__file__), 'configs', 'test_config_2.xpc'))
+
+        self.xm.session.clear_stats()
+        streams_delta = XenaStatsDelta(XenaStreamsStats(self.xm.session))
+        assert(streams_delta.update() is None)
+        assert(streams_delta.rates() is None)
+        assert(streams_delta.loss() is None)
+        self.xm.session.start_traffic(blocking=True)
+        deltas = streams_delta.update()
+        assert(deltas['Stream 1-1']['tx_packets'] == 8000)
+        assert(streams_delta.loss()['Stream 1-1']['loss'] == 0)
+
+        self.xm.session.clear_stats()
+        assert(streams_delta.update()['Stream 1-1']['tx_packets'] == 0)
+
+        # Two snapshots with the same timestamp.
+        streams_delta.update(read=False)
+        assert(streams_delta.rates() is None)
+
     def test_capture(self):
         port = self.xm.session.reserve_ports([self.port1])[self.port1]
         port.load_config(path.join(path.dirname(__file__), 'configs', 'test_config_loopback.xpc'))
@@ -109,16 +191,98 @@ class TestXenaOnline(TestXenaBase):
         print(packets[0])
         assert(len(packets) == 10)
 
+        bin_packets = port.capture.read_packets(window=16)
+        assert(len(bin_packets) == 80)
+        assert(bin_packets[10] == binascii.unhexlify(packets[0]))
+        assert(list(port.capture.iter_packets(window=16, prefetch=2)) == bin_packets)
+        decoded = port.capture.decode_packets(fields=['ip.dst_s'], workers=2, chunk_size=16)
+        assert(len(decoded) == 80)
+        assert(decoded[0]['ip.dst_s'] == '1.1.0.0')
+        assert('ip' in port.capture.decode_packets(0, 1)[0]['layers'])
+        packet, extra, info = port.capture.read_packets(0, 1, extra=True)[0]
+        assert(len(extra) == 4)
+        assert(info is None)
+
         packets = port.capture.get_packets(file_name=path.join(self.temp_dir, 'xena_cap.txt'))
         print(packets[0])
         assert(len(packets) == 80)
 
         tshark = Tshark(self.config.get('General', 'wireshark_dir'))
-        packets = port.capture.get_packets(cap_type=XenaCaptureBufferType.pcap,
-                                           file_name=path.join(self.temp_dir, 'xena_cap.pcap'), tshark=tshark)
+        port.capture.get_packets(cap_type=XenaCaptureBufferType.pcap,
+                                 file_name=path.join(self.temp_dir, 'xena_cap.pcap'))
         analyser = TsharkAnalyzer()
         analyser.add_field('ip.src')
         analyser.add_field('ip.dst')
         fields = tshark.analyze(path.join(self.temp_dir, 'xena_cap.pcap'), analyser)
         print(fields)
         assert(len(fields) == 80)
+
+        port.capture.get_packets(cap_type=XenaCaptureBufferType.pcapng,
+                                 file_name=path.join(self.temp_dir, 'xena_cap.pcapng'))
+        fields = tshark.analyze(path.join(self.temp_dir, 'xena_cap.pcapng'), analyser)
+        assert(len(fields) == 80)
+
+        index = port.capture.build_index(path.join(self.temp_dir, 'xena_cap.pcap'))
+        assert(list(index.tplds.keys()) == [0])
+        assert(index.first(tpld_id=0) == 0)
+        assert(index.last(tpld_id=0) == 79)
+        assert(index.gaps(0) == [])
+        assert(index.packet(10) == bin_packets[10])
+
+        port.capture.get_packets(cap_type=XenaCaptureBufferType.store, file_name=path.join(self.temp_dir, 'xena.cap'))
+        with XenaCaptureStore(path.join(self.temp_dir, 'xena.cap')) as store:
+            assert(len(store) == 80)
+            assert(bytes(store[10]) == bin_packets[10])
+            assert([bytes(p) for p in store[20:30]] == bin_packets[20:30])
+
+    def test_capture_tail(self):
+        port = self.xm.session.reserve_ports([self.port1])[self.port1]
+        port.load_config(path.join(path.dirname(__file__), 'configs', 'test_config_loopback.xpc'))
+
+        port.streams[0].set_attributes(ps_ratepps=10, ps_packetlimit=80)
+        port.remove_stream(1)
+
+        port.start_capture()
+        indices = []
+        capture_tail = port.capture.tail(interval=0.5, callback=lambda index, packet: indices.append(index))
+        port.start_traffic(blocking=True)
+        port.stop_capture()
+        capture_tail.stop()
+
+        assert(indices == list(range(80)))
+        assert(capture_tail.queue.qsize() == 81)
+
+    def test_add_streams(self):
+        port = self.xm.session.reserve_ports([self.port1])[self.port1]
+        port.load_config(path.join(path.dirname(__file__), 'configs', 'test_config_loopback.xpc'))
+
+        headers = ethernet.Ethernet(src_s='22:22:22:22:22:22')
+        specs = [{'name': 'bulk {}'.format(i), 'headers': headers, 'ps_ratepps': 10} for i in range(64)]
+        streams = port.add_streams(specs, batch_size=16)
+        assert(len(streams) == 64)
+        assert(len(port.streams) == 66)
+        assert(streams[10].get_attribute('ps_comment') == 'bulk 10')
+        assert(streams[10].get_attribute('ps_ratepps') == '10')
+        assert(streams[10].get_packet_headers().src_s == '22:22:22:22:22:22')
+        assert(len(set(s.tpld_id for s in port.streams.values())) == 66)
+
+    def test_stream_template(self):
+        port = self.xm.session.reserve_ports([self.port1])[self.port1]
+        port.load_config(path.join(path.dirname(__file__), 'configs', 'test_config_loopback.xpc'))
+
+        template = port.streams[0].get_template()
+        specs = [{'name': 'clone {}'.format(i), 'fields': {'ip.dst': '10.0.0.{}'.format(i), 'vlan.id': 100 + i}}
+                 for i in range(16)]
+        clones = template.clone(port, specs, batch_size=4)
+        assert(len(clones) == 16)
+        assert(len(port.streams) == 18)
+        assert(clones[3].get_attribute('ps_comment') == 'clone 3')
+        assert(clones[3].get_attribute('ps_ratepps') == port.streams[0].get_attribute('ps_ratepps'))
+        assert(clones[3].get_packet_headers().ip.dst_s == '10.0.0.3')
+        assert(clones[3].get_packet_headers().vlan[0].vid == 103)
+        assert(len(clones[3].modifiers) == len(port.streams[0].modifiers))
+
+        with pytest.raises(ValueError):
+            template.clone(port, [{'fields': {'ip.dst': '10.0.0.1'}, 'ps_packetheader': clones[0].get_attribute(
+                'ps_packetheader')}])
+        assert(len(port.streams) == 18)
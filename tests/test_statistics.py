@@ -0,0 +1,130 @@
+"""
+Test Xena statistics auxiliary classes that do not require chassis - exporters, shared memory and metrics server.
+
+@author yoram@ignissoft.com
+"""
+
+from os import path
+from collections import OrderedDict
+import csv
+import gzip
+import json
+import time
+import requests
+import pytest
+
+from trafficgenerator.tgn_utils import TgnError
+from trafficgenerator.test.test_tgn import TestTgnBase
+from xenavalkyrie.xena_app import init_xena
+from xenavalkyrie.xena_stream import XenaStream
+from xenavalkyrie.xena_statistics_view import XenaStreamsStats
+from xenavalkyrie.xena_statistics_export import XenaStatsCsvWriter, XenaStatsJsonWriter
+from xenavalkyrie.xena_statistics_shm import XenaStatsPublisher, XenaStatsReader
+
+
+class TestXenaStatistics(TestTgnBase):
+
+    TestTgnBase.config_file = path.join(path.dirname(__file__), 'XenaValkyrie.ini')
+
+    def setup(self):
+        self.temp_dir = self.config.get('General', 'temp_dir')
+        self.xm = init_xena(self.api, self.logger, self.config.get('Xena', 'owner'))
+
+    def teardown(self):
+        self.xm.session.disconnect()
+
+    def test_export(self):
+        view = self._streams_view()
+        view.tx_statistics['s,"3"'] = OrderedDict(zip(XenaStream.stats_captions, [9, 10, 11, 12]))
+
+        csv_file = path.join(self.temp_dir, 'xena_stats.csv')
+        with XenaStatsCsvWriter(view, csv_file, counters=['packets', 'bps']) as writer:
+            writer.write()
+            assert(writer in view.writers)
+        assert(writer not in view.writers)
+        with open(csv_file) as f:
+            rows = list(csv.reader(f))
+        assert(rows[0] == ['timestamp', 'name', 'packets', 'bps'])
+        assert(rows[1:] == [['1000.5', 's1', '4', '1'], ['1000.5', 's2', '8', '5'], ['1000.5', 's,"3"', '12', '9']])
+
+        json_file = path.join(self.temp_dir, 'xena_stats.json.gz')
+        with XenaStatsJsonWriter(view, json_file, compress=True) as writer:
+            writer.write()
+            view.timestamp = 1001.5
+            writer.write()
+        with gzip.open(json_file, 'rb') as f:
+            rows = [json.loads(line.decode('utf-8')) for line in f.read().splitlines()]
+        assert(len(rows) == 6)
+        assert(rows[0] == dict(timestamp=1000.5, name='s1', bps=1, pps=2, bytes=3, packets=4))
+        assert(rows[5]['timestamp'] == 1001.5 and rows[5]['name'] == 's,"3"' and rows[5]['packets'] == 12)
+
+    def test_shm(self):
+        view = self._streams_view()
+        file_name = path.join(self.temp_dir, 'xena_stats.shm')
+        with XenaStatsPublisher(view, file_name) as publisher:
+            with XenaStatsReader(file_name) as reader:
+                assert(reader.objects == ['s1', 's2'])
+                assert(reader.counters == XenaStream.stats_captions)
+                publisher.write()
+                timestamp, table = reader.read()
+                assert(timestamp == 1000.5)
+                assert(table['s2'] == view.tx_statistics['s2'])
+                assert(reader.get('s1', 'packets') == (1000.5, 4))
+
+                # Publish new snapshot while the reader reads - the reader must retry and return the new snapshot.
+                calls = []
+
+                def read_values(timestamp, values):
+                    calls.append(timestamp)
+                    if len(calls) == 1:
+                        view.timestamp = 1001.5
+                        view.tx_statistics['s1']['packets'] = 40
+                        publisher.write()
+                    return timestamp, values[XenaStream.stats_captions.index('packets')]
+
+                assert(reader.read(read_values) == (1001.5, 40))
+                assert(calls == [1000.5, 1001.5])
+
+                # Publisher died while writing - the sequence stays odd.
+                publisher._set_sequence(publisher.sequence + 1)
+                with pytest.raises(TgnError):
+                    reader.read(timeout=0.05)
+
+    def test_metrics_server(self):
+        server = self.xm.session.start_metrics_server(0, interval=0.1)
+        assert(server.port != 0)
+        for _ in range(50):
+            if server.metrics:
+                break
+            time.sleep(0.1)
+
+        base_url = 'http://localhost:{}'.format(server.port)
+        response = requests.get(base_url + '/metrics')
+        assert(response.status_code == 200)
+        assert(response.headers['Content-Type'] == server.content_type)
+        assert('# TYPE xena_poller_samples_total counter' in response.text.split('\n'))
+        assert(requests.get(base_url + '/other').status_code == 404)
+
+        self.xm.session.disconnect()
+        assert(not self.xm.session.stats_pollers)
+        assert(not server.thread.is_alive())
+
+    def test_poller_stop_from_callback(self):
+        poller = self.xm.session.start_stats_poller([XenaStreamsStats(self.xm.session)], interval=0.05)
+        poller.subscribe(lambda timestamp, sample: poller.stop())
+        poller.join(5)
+        assert(not poller.is_alive())
+        assert(poller not in self.xm.session.stats_pollers)
+
+    #
+    # Private methods.
+    #
+
+    def _streams_view(self):
+        view = XenaStreamsStats(self.xm.session)
+        view.timestamp = 1000.5
+        view.tx_statistics = OrderedDict()
+        view.tx_statistics['s1'] = OrderedDict(zip(XenaStream.stats_captions, [1, 2, 3, 4]))
+        view.tx_statistics['s2'] = OrderedDict(zip(XenaStream.stats_captions, [5, 6, 7, 8]))
+        view.statistics = OrderedDict((name, {'tx': stats}) for name, stats in view.tx_statistics.items())
+        return view
@@ -5,9 +5,14 @@ Test Xena Tshark auxiliary class.
 """
 
 from os import path
+import binascii
 
 from trafficgenerator.test.test_tgn import TestTgnBase
 from xenavalkyrie.xena_tshark import Tshark, TsharkAnalyzer
+from xenavalkyrie.xena_pcap import XenaPcapWriter, XenaPcapngWriter, hexdump, read_pcap
+from xenavalkyrie.xena_capture_index import XenaCaptureIndex
+from xenavalkyrie.xena_capture_store import XenaCaptureStoreWriter, XenaCaptureStore
+from xenavalkyrie.xena_pcap_analyzer import PcapAnalyzer
 
 
 class TestXenaTshark(TestTgnBase):
@@ -27,6 +32,45 @@ class TestXenaTshark(TestTgnBase):
     def test_to_pcap(self):
         self.tshark.text_to_pcap(self.text_file)
 
+    def test_hexdump(self):
+        packets = self._read_text_file()
+        with open(self.text_file) as f:
+            assert(''.join(hexdump(packet) for packet in packets) == f.read())
+        assert(hexdump(b'\x01' * 65537).endswith('\n010000 01'))
+
+    def test_pcap_writer(self):
+        packets = self._read_text_file()
+        assert(len(packets) == 80)
+
+        analyser = TsharkAnalyzer()
+        analyser.add_field('ip.dst')
+        for writer_class, file_name in ((XenaPcapWriter, 'xena_cap.pcap'), (XenaPcapngWriter, 'xena_cap.pcapng')):
+            with writer_class(path.join(self.temp_dir, file_name)) as writer:
+                writer.write_packets(packets)
+            fields = self.tshark.analyze(path.join(self.temp_dir, file_name), analyser)
+            assert(len(fields) == 80)
+
+    def test_capture_store(self):
+        records = list(read_pcap(self.pcap_file))
+        assert(len(records) == 80)
+
+        store_file = path.join(self.temp_dir, 'xena_cap.store')
+        with XenaCaptureStoreWriter(store_file) as writer:
+            writer.write_packets((packet, timestamp) for timestamp, packet in records)
+        with XenaCaptureStore(store_file) as store:
+            assert(len(store) == 80)
+            assert(bytes(store[0]) == records[0][1])
+            assert(bytes(store[-1]) == records[-1][1])
+            assert([bytes(p) for p in store[2:4]] == [p for _, p in records[2:4]])
+            assert([store.timestamps[i] for i in range(len(store))] == [t for t, _ in records])
+
+            # Round trip back to pcap.
+            pcap_file = path.join(self.temp_dir, 'xena_cap_store.pcap')
+            with XenaPcapWriter(pcap_file) as writer:
+                for index, packet in enumerate(store):
+                    writer.write(bytes(packet), store.timestamps[index])
+        assert(list(read_pcap(pcap_file)) == records)
+
     def test_analyze(self):
         analyser = TsharkAnalyzer()
         analyser.add_field('ip.src')
@@ -42,3 +86,79 @@ class TestXenaTshark(TestTgnBase):
         fields = self.tshark.analyze(self.pcap_file, analyser)
         print(fields)
         assert(len(fields) == 0)
+
+    def test_iter_analyze(self):
+        analyser = TsharkAnalyzer()
+        analyser.add_field('ip.dst')
+        fields = self.tshark.iter_analyze(self.pcap_file, analyser)
+        assert(next(fields) == {'ip.dst': ['1.1.0.0']})
+        fields.close()
+        fields = list(self.tshark.iter_analyze_files([self.pcap_file] * 3, analyser, processes=2))
+        assert(len(fields) == 240)
+        assert(set(f[0] for f in fields) == {self.pcap_file})
+
+    def test_pcap_analyzer(self):
+        for analyser_class in (TsharkAnalyzer, PcapAnalyzer):
+            analyser = analyser_class()
+            analyser.add_field('ip.src')
+            analyser.add_field('ip.dst')
+            analyser.add_field('vlan.id')
+            if analyser_class == TsharkAnalyzer:
+                tshark_fields = self.tshark.analyze(self.pcap_file, analyser)
+            else:
+                fields = analyser.analyze(self.pcap_file)
+        assert(fields == tshark_fields)
+        analyser.set_read_filter('ip.dst == 1.1.0.1')
+        assert(len(analyser.analyze(self.pcap_file)) == 1)
+        analyser.set_read_filter('ip.dst == 1.1.0.1 && frame.number >= 10')
+        assert(len(analyser.analyze(self.pcap_file)) == 0)
+
+    def test_pcap_analyzer_tpld(self):
+        analyser = PcapAnalyzer()
+        analyser.add_field('xena.seq')
+        analyser.add_field('xena.tpld_id')
+
+        # Last packet in xena_cap.pcap is truncated (63 bytes) so its TPLD, located relative to the packet end, is lost.
+        analyser.set_read_filter('frame.len == 64')
+        fields = analyser.analyze(self.pcap_file)
+        assert(len(fields) == 79)
+        assert([int(f['xena.seq'][0]) for f in fields] == list(range(79)))
+        assert(set(f['xena.tpld_id'][0] for f in fields) == {'38'})
+
+        pcap_file = path.join(self.temp_dir, 'xena_cap_tpld.pcap')
+        with XenaPcapWriter(pcap_file) as writer:
+            writer.write_packets(self._read_text_file())
+        analyser.set_read_filter(None)
+        fields = analyser.analyze(pcap_file)
+        assert([int(f['xena.seq'][0]) for f in fields] == list(range(80)))
+        assert(set(f['xena.tpld_id'][0] for f in fields) == {'38'})
+
+    def test_capture_index(self):
+        index = XenaCaptureIndex.build(self.pcap_file)
+        assert(len(index) == 80)
+        # Last packet in xena_cap.pcap is truncated (63 bytes) so its TPLD, located relative to the packet end, is lost.
+        assert(index.tplds[38].tolist() == list(range(79)))
+        assert(index.sequences[38].tolist() == list(range(79)))
+        assert(index.gaps(38) == [])
+        assert(index.vlans[17].tolist() == list(range(80)))
+        assert(index.lookup(vlan=17, flow=('1.1.1.1', '1.1.0.1', 255, 0, 0)) == [1])
+        assert(index.packet(1) == list(read_pcap(self.pcap_file))[1][1])
+
+        loaded = XenaCaptureIndex.load(index.save(path.join(self.temp_dir, 'xena_cap.pcap.idx')))
+        assert(loaded.pcap_file == self.pcap_file)
+        for attribute in ('timestamps', 'offsets', 'lengths', 'tplds', 'sequences', 'vlans', 'flows'):
+            assert(getattr(loaded, attribute) == getattr(index, attribute))
+
+    #
+    # Private methods.
+    #
+
+    def _read_text_file(self):
+        packets = []
+        with open(self.text_file) as f:
+            for line in f.read().split('\n'):
+                if line.startswith('000000'):
+                    packets.append(b'')
+                if line:
+                    packets[-1] += binascii.unhexlify(''.join(line.split()[1:]))
+        return packets
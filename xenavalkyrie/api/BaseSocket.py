@@ -56,22 +56,32 @@ class BaseSocket:
             raise socket.error("sendCommand() on a disconnected socket")
 
         try:
-            self.sock.send(bytearray(cmd + '\n', 'utf-8'))
+            self.sock.sendall(bytearray(cmd + '\n', 'utf-8'))
         except socket.error as error:
             self.disconnect()
-            raise socket.error("Fail to send command: {}, error: {}", cmd, error)
+            raise socket.error("Fail to send command: {}, error: {}".format(cmd, error))
 
     def readReply(self):
+        """ Read complete reply lines.
+
+        Syntax error markers lines (---^ / ^---) are removed, other lines in the same chunk are kept as they might be
+        replies to other (pipelined) commands.
+        """
         if not self.connected:
             raise socket.error("readReply() on a disconnected socket")
 
         try:
-            reply = self.sock.recv(4096)
-            while not reply.endswith(b'\x0a'):
-                reply += self.sock.recv(4096)
-            if reply.find(b'---^') != -1 or reply.find(b'^---') != -1:
-                # read next line for actual message
-                reply = self.sock.recv(4096)
+            reply = self._recv()
+            while True:
+                while not reply.endswith(b'\x0a'):
+                    reply += self._recv()
+                lines = reply.split(b'\x0a')
+                replies_lines = [l for l in lines if l.find(b'---^') == -1 and l.find(b'^---') == -1]
+                if len(replies_lines) == len(lines) or any(replies_lines):
+                    reply = b'\x0a'.join(replies_lines)
+                    break
+                # only markers, read next line for actual message
+                reply = self._recv()
         except Exception as error:
             self.disconnect()
             raise IOError('Fail to read response, error: {}'.format(error))
@@ -89,3 +99,9 @@ class BaseSocket:
     def set_keepalives(self):
         logger.debug("Setting socket keepalive")
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+
+    def _recv(self):
+        data = self.sock.recv(4096)
+        if not data:
+            raise socket.error('Connection closed by peer')
+        return data
@@ -64,6 +64,41 @@ class XenaCliWrapper(object):
         index_command = obj._build_index_command(command, *arguments)
         return self.sockets_list[obj.chassis].sendQuery(index_command, True)
 
+    def send_multi_commands(self, obj_commands):
+        """ Send multiple commands in a single write per chassis and verify all succeeded.
+
+        :param obj_commands: list of (object, command, arguments list) to send.
+        """
+        for chassis, chassis_commands in self._per_chassis_commands(obj_commands).items():
+            index_commands = [obj._build_index_command(command, *arguments) for _, obj, command, arguments in
+                              chassis_commands]
+            self.sockets_list[chassis].sendQueriesVerify(index_commands)
+
+    def send_multi_commands_return(self, obj_commands):
+        """ Send multiple commands in a single write per chassis and wait for single line output per command.
+
+        :param obj_commands: list of (object, command, arguments list) to send.
+        :return: list of commands outputs, ordered as obj_commands.
+        """
+        returns = [None] * len(obj_commands)
+        for chassis, chassis_commands in self._per_chassis_commands(obj_commands).items():
+            index_commands = [obj._build_index_command(command, *arguments) for _, obj, command, arguments in
+                              chassis_commands]
+            replies = self.sockets_list[chassis].sendQueries(index_commands)
+            for (i, obj, command, _), reply in zip(chassis_commands, replies):
+                returns[i] = obj._extract_return(command, reply)
+        return returns
+
+    def get_multi_attributes(self, obj_attributes):
+        """ Returns multiple attributes of multiple objects in a single write per chassis.
+
+        :param obj_attributes: list of (object, attribute) to query.
+        :returns: list of returned values, ordered as obj_attributes.
+        :rtype: list(str)
+        """
+        raw_returns = self.send_multi_commands_return([(o, a, ['?']) for o, a in obj_attributes])
+        return [r[1:-1] if len(r) > 2 and r[0] == '"' and r[-1] == '"' else r for r in raw_returns]
+
     def get_attribute(self, obj, attribute):
         """ Returns single object attribute.
 
@@ -120,3 +155,22 @@ class XenaCliWrapper(object):
         :rtype: list(int)
         """
         return [int(v) for v in self.get_attribute(obj, stat_name).split()]
+
+    def get_multi_stats(self, obj_stat_names):
+        """ Send multiple CLI commands that return list of integer counters in a single write per chassis.
+
+        :param obj_stat_names: list of (object, statistics command name).
+        :return: list of counters lists, ordered as obj_stat_names.
+        :rtype: list(list(int))
+        """
+        return [[int(v) for v in r.split()] for r in self.get_multi_attributes(obj_stat_names)]
+
+    #
+    # Private methods.
+    #
+
+    def _per_chassis_commands(self, obj_commands):
+        per_chassis_commands = {}
+        for i, (obj, command, arguments) in enumerate(obj_commands):
+            per_chassis_commands.setdefault(obj.chassis, []).append((i, obj, command, arguments))
+        return per_chassis_commands
@@ -151,6 +151,44 @@ class XenaRestWrapper(object):
         """
         return [int(v) for v in self.send_command_return(obj, stat_name, '?').split()]
 
+    def send_multi_commands(self, obj_commands):
+        """ Send multiple commands with no output.
+
+        REST server does not support pipelining so commands are sent one by one.
+
+        :param obj_commands: list of (object, command, arguments list) to send.
+        """
+        for obj, command, arguments in obj_commands:
+            self.send_command(obj, command, *arguments)
+
+    def send_multi_commands_return(self, obj_commands):
+        """ Send multiple commands with single line output.
+
+        REST server does not support pipelining so commands are sent one by one.
+
+        :param obj_commands: list of (object, command, arguments list) to send.
+        :return: list of commands outputs, ordered as obj_commands.
+        """
+        return [self.send_command_return(obj, command, *arguments) for obj, command, arguments in obj_commands]
+
+    def get_multi_attributes(self, obj_attributes):
+        """ Returns multiple attributes of multiple objects.
+
+        :param obj_attributes: list of (object, attribute) to query.
+        :returns: list of returned values, ordered as obj_attributes.
+        :rtype: list(str)
+        """
+        return [self.get_attribute(obj, attribute) for obj, attribute in obj_attributes]
+
+    def get_multi_stats(self, obj_stat_names):
+        """ Send multiple CLI commands that return list of integer counters.
+
+        :param obj_stat_names: list of (object, statistics command name).
+        :return: list of counters lists, ordered as obj_stat_names.
+        :rtype: list(list(int))
+        """
+        return [self.get_stats(obj, stat_name) for obj, stat_name in obj_stat_names]
+
     def keep_alive(self):
         """ Send keep alive message. """
         self.logger.debug("Send KeepAlive message")
@@ -69,41 +69,38 @@ class XenaSocket(object):
         self.logger.debug("sendCommand(%s) returning", cmd)
 
     def __sendQueryReplies(self, cmd):
-        # send the command followed by cmd SYNC to find out
-        # when the last reply arrives.
-        self.access_semaphor.acquire()
-        self.last_command_timestamp = time.time()
-        self.bsocket.sendCommand(cmd.strip('\n'))
-        self.bsocket.sendCommand('SYNC')
-        replies = []
-        msg = self.bsocket.readReply()
-        while True:
-            if '\n' in msg:
-                (reply, msgleft) = msg.split('\n', 1)
-                # check for syntax problems
-                if reply.rfind('Syntax') != -1:
-                    self.access_semaphor.release()
-                    raise XenaCommandError("Multiline: syntax error - {}".format(reply))
+        """ Send command(s) followed by SYNC and read all replies up to the <SYNC> reply.
 
+        Replies are always read to the end, also when some commands failed, so the connection stays in sync. The
+        callers check the replies for errors.
+        """
+        self.access_semaphor.acquire()
+        try:
+            self.last_command_timestamp = time.time()
+            self.bsocket.sendCommand(cmd.strip('\n') + '\nSYNC')
+            replies = []
+            msg = ''
+            while True:
+                if '\n' not in msg:
+                    # more bytes to come
+                    msg += self.bsocket.readReply()
+                    continue
+                (reply, msg) = msg.split('\n', 1)
                 if reply.rfind('<SYNC>') == 0:
                     self.logger.debug("Multiline EOL SYNC message")
-                    self.access_semaphor.release()
                     return replies
-
                 self.logger.debug("Multiline reply: %s", reply)
                 replies.append(reply + '\n')
-                msg = msgleft
-            else:
-                # more bytes to come
-                msgnew = self.bsocket.readReply()
-                msg = msgleft + msgnew
+        finally:
+            self.access_semaphor.release()
 
     def __sendQueryReply(self, cmd):
         self.access_semaphor.acquire()
-        self.last_command_timestamp = time.time()
-        reply = self.bsocket.sendQuery(cmd).strip('\n')
-        self.access_semaphor.release()
-        return reply
+        try:
+            self.last_command_timestamp = time.time()
+            return self.bsocket.sendQuery(cmd).strip('\n')
+        finally:
+            self.access_semaphor.release()
 
     def sendQuery(self, cmd, multilines=False):
         """ Send command, wait for response (single or multi lines), test for errors and return the returned code.
@@ -133,6 +130,42 @@ class XenaSocket(object):
             self.logger.debug('reply({})'.format(reply))
             return reply
 
+    def sendQueries(self, cmds):
+        """ Send multiple commands in a single write, wait for all responses, test for errors and return them.
+
+        Each command must return a single line - either value (for queries) or <OK> (for set commands).
+
+        :param cmds: list of commands to send.
+        :return: list of commands return values, ordered as the commands.
+        """
+        self.logger.debug('sendQueries({})'.format(cmds))
+        if not self.is_connected():
+            raise socket.error('sendQueries on a disconnected socket')
+
+        if not cmds:
+            return []
+        replies = [r.strip('\n') for r in self.__sendQueryReplies('\n'.join([c.strip() for c in cmds]))]
+        failures = [(i, cmd, reply) for i, (cmd, reply) in enumerate(zip(cmds, replies))
+                    if reply.startswith(XenaSocket.reply_errors)]
+        if len(replies) != len(cmds):
+            raise XenaCommandError('sendQueries - expected {} replies, got {}{}'.
+                                   format(len(cmds), len(replies), _failures_str(failures)))
+        if failures:
+            raise XenaCommandError('sendQueries - {} of {} commands failed{}'.
+                                   format(len(failures), len(cmds), _failures_str(failures)))
+        return replies
+
+    def sendQueriesVerify(self, cmds):
+        """ Send multiple commands without return value in a single write, wait for completion, verify success.
+
+        :param cmds: list of commands to send.
+        """
+        failures = [(i, cmd, reply) for i, (cmd, reply) in enumerate(zip(cmds, self.sendQueries(cmds)))
+                    if reply != self.reply_ok]
+        if failures:
+            raise XenaCommandError('sendQueriesVerify - {} of {} commands failed, expected {}{}'.
+                                   format(len(failures), len(cmds), self.reply_ok, _failures_str(failures)))
+
     def sendQueryVerify(self, cmd):
         """ Send command without return value, wait for completion, verify success.
 
@@ -152,3 +185,7 @@ class XenaSocket(object):
         """ Send keep alive message. """
         self.logger.debug("Send KeepAlive message")
         self.sendQuery('')
+
+
+def _failures_str(failures):
+    return ''.join(' - [{}] {} reply({})'.format(i, cmd, reply) for i, cmd, reply in failures)
@@ -7,6 +7,8 @@ Two Xena ports connected back to back.
 @author yoram@ignissoft.com
 """
 
+from __future__ import print_function
+
 import sys
 import logging
 import time
@@ -60,16 +62,17 @@ def measure():
     port_stats = XenaPortsStats(xm.session)
     streams_stats = XenaStreamsStats(xm.session)
 
-    # Loop for 10 seconds or any condition you want
-    for _ in range(10):
+    # Poll statistics every second in the background and print each sample as it arrives.
+    poller = xm.session.start_stats_poller([port_stats, streams_stats], interval=1)
+    poller.subscribe(lambda timestamp, sample: print(timestamp, sample[port_stats].dumps()))
 
-        # Get statistics.
-        port_stats.read_stats()
-        streams_stats.read_stats()
-        print(port_stats.statistics.dumps())
-        print(streams_stats.statistics.dumps())
+    # Run for 10 seconds or any condition you want, the test thread is free to do other things.
+    time.sleep(10)
+    poller.stop()
 
-        time.sleep(1)
+    # Samples of the last 5 seconds.
+    for timestamp, sample in poller.window(5):
+        print(timestamp, sample[streams_stats].dumps())
 
 
 def run_all():
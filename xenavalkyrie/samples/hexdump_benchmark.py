@@ -0,0 +1,53 @@
+"""
+Compare capture text (hexdump) formatting - per character loop (old implementation) vs. row based hexdump.
+
+Setup:
+No chassis required.
+
+@author yoram@ignissoft.com
+"""
+
+from __future__ import print_function
+
+import io
+import os
+import binascii
+import timeit
+
+from xenavalkyrie.xena_pcap import hexdump
+
+packet_size = 9000
+num_packets = 1000
+
+
+def char_loop_hexdump(raw_packet):
+    """ Old XenaCapture.get_packets text formatting. """
+
+    text_packet = ''
+    for c, b in zip(range(len(raw_packet)), raw_packet):
+        if c % 32 == 0:
+            text_packet += '\n{:06x} '.format(int(c / 2))
+        elif c % 2 == 0:
+            text_packet += ' '
+        text_packet += b
+    return text_packet
+
+
+def run_all():
+    packets = [os.urandom(packet_size) for _ in range(num_packets)]
+    raw_packets = [binascii.hexlify(p).decode('utf-8').upper() for p in packets]
+    assert [char_loop_hexdump(r) for r in raw_packets[:10]] == [hexdump(p) for p in packets[:10]]
+
+    char_loop_time = timeit.timeit(lambda: [char_loop_hexdump(r) for r in raw_packets], number=1)
+    hexdump_time = timeit.timeit(lambda: [hexdump(p) for p in packets], number=1)
+    f = io.StringIO()
+    file_time = timeit.timeit(lambda: [hexdump(p, f) for p in packets], number=1)
+
+    print('{} packets of {} bytes'.format(num_packets, packet_size))
+    print('character loop: {:.3f} seconds'.format(char_loop_time))
+    print('hexdump:        {:.3f} seconds (x{:.0f})'.format(hexdump_time, char_loop_time / hexdump_time))
+    print('hexdump (file): {:.3f} seconds (x{:.0f})'.format(file_time, char_loop_time / file_time))
+
+
+if __name__ == '__main__':
+    run_all()
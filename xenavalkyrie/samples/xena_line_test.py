@@ -15,6 +15,7 @@ from xenavalkyrie.xena_app import init_xena
 from xenavalkyrie.xena_port import XenaPort
 from xenavalkyrie.xena_stream import XenaStreamState
 from xenavalkyrie.xena_statistics_view import XenaPortsStats
+from xenavalkyrie.xena_statistics_export import XenaStatsCsvWriter
 
 
 version = 0.3
@@ -64,6 +65,8 @@ def xena_line_test(args=None):
                              help='Results output file')
     run_analyze.add_argument('-c', '--counters', required=False, default=SUPPRESS, nargs='+', metavar='counter',
                              help='List of counters to save in output file. (default: all)')
+    run_analyze.add_argument('-s', '--samples', required=False, default=SUPPRESS, metavar='file',
+                             help='Record counters every second during the run to CSV file (gzip if ends with .gz)')
 
     # Process arguments
     parsed_args = parser.parse_args(args)
@@ -123,26 +126,30 @@ def run_test(parsed_args):
         for stream in port.streams.values():
             stream.set_state(XenaStreamState.enabled)
 
+    counters = parsed_args.counters if hasattr(parsed_args, 'counters') else None
+    ports_stats = XenaPortsStats(chassis.parent, counters)
+
     chassis.start_traffic()
-    time.sleep(parsed_args.time)
+    if hasattr(parsed_args, 'samples'):
+        with XenaStatsCsvWriter(ports_stats, parsed_args.samples, compress=parsed_args.samples.endswith('.gz')):
+            poller = chassis.parent.start_stats_poller([ports_stats])
+            time.sleep(parsed_args.time)
+            poller.stop()
+    else:
+        time.sleep(parsed_args.time)
     chassis.stop_traffic()
 
     time.sleep(2)
 
-    counters = parsed_args.counters if hasattr(parsed_args, 'counters') else None
     with open(parsed_args.results, 'w+') as f:
-        ports_stats = XenaPortsStats(chassis.parent)
         ports_stats.read_stats()
+        flat_stats = ports_stats.get_flat_stats()
         if counters:
             f.write('port,{}\n'.format(','.join(counters)))
             for port in chassis.ports:
-                line = port
-                for counter in counters:
-                    line += ','
-                    line += str(ports_stats.get_flat_stats()[port][counter])
-                f.write('{}\n'.format(line))
+                f.write('{},{}\n'.format(port, ','.join([str(flat_stats[port][c]) for c in counters])))
         else:
-            f.write(json.dumps(ports_stats.get_flat_stats(), indent=2))
+            f.write(json.dumps(flat_stats, indent=2))
 
     for port in chassis.ports.values():
         port.release()
@@ -199,8 +199,7 @@ def traffic():
 
     # Analyze capture buffer with tshark.
     tshark = Tshark(wireshark_path)
-    packets = ports[port0].capture.get_packets(cap_type=XenaCaptureBufferType.pcap,
-                                               file_name=pcap_file, tshark=tshark)
+    ports[port0].capture.get_packets(cap_type=XenaCaptureBufferType.pcap, file_name=pcap_file)
     analyser = TsharkAnalyzer()
     analyser.add_field('ip.src')
     analyser.add_field('ip.dst')
@@ -13,7 +13,10 @@ from xenavalkyrie.api.xena_rest import XenaRestWrapper
 from xenavalkyrie.api.xena_cli import XenaCliWrapper
 from xenavalkyrie.xena_object import XenaObject, XenaObjectsDict
 from xenavalkyrie.xena_port import XenaPort
+from xenavalkyrie.xena_stream import XenaTpldIdAllocator
 from xenavalkyrie.xena_chimera_port import XenaChimeraPort
+from xenavalkyrie.xena_statistics_poller import XenaStatsPoller
+from xenavalkyrie.xena_statistics_http import XenaStatsHttpServer
 
 
 def init_xena(api, logger, owner, ip=None, port=57911):
@@ -68,6 +71,11 @@ class XenaSession(XenaObject):
         super(self.__class__, self).__init__(objType='session', index='', parent=None, objRef=owner)
         self.session = self
         self.chassis = None
+        self.stats_pollers = []
+        self.capture_tails = []
+        self.metrics_server = None
+        #: TPLD IDs allocator shared by all session ports, on all chassis.
+        self.tpld_ids = XenaTpldIdAllocator()
         self.api.connect(owner)
 
     def add_chassis(self, chassis, port=22611, password='xena'):
@@ -93,6 +101,14 @@ class XenaSession(XenaObject):
     def disconnect(self, release=True):
         """ Release ports and disconnect from all chassis. """
 
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        for poller in list(self.stats_pollers):
+            poller.stop()
+        for capture_tail in list(self.capture_tails):
+            capture_tail.stop()
+
         if release:
             self.release_ports()
             
@@ -194,15 +210,55 @@ class XenaSession(XenaObject):
     def read_stats(self, *ports):
         """ Read statistics on list of ports.
 
+        All statistics of all ports on the same chassis are read in a single write/read cycle.
+
         :param ports: list of ports to read statistics. Default - all session ports.
         """
 
         statistics = XenaObjectsDict()
-        for port in self._get_operation_ports(*ports):
-            statistics[port] = port.read_port_stats()
+        for chassis, chassis_ports in self._per_chassis_ports(*self._get_operation_ports(*ports)).items():
+            statistics.update(chassis.read_ports_stats(*chassis_ports))
 
         return statistics
 
+    def start_stats_poller(self, views, interval=1, size=3600):
+        """ Start background polling of statistics views.
+
+        The poller shares the session connections with the test thread, so the test should not modify the
+        configuration of polled objects (add/remove streams etc.) while the poller is running.
+
+        :param views: list of statistics views to poll.
+        :type views: list of xenavalkyrie.xena_statistics_view.XenaStats
+        :param interval: polling interval in seconds.
+        :param size: number of samples to keep.
+        :return: running poller, stopped on disconnect or explicitly with poller.stop().
+        :rtype: xenavalkyrie.xena_statistics_poller.XenaStatsPoller
+        """
+
+        poller = XenaStatsPoller(self, views, interval, size)
+        self.stats_pollers.append(poller)
+        poller.start()
+        return poller
+
+    def start_metrics_server(self, port, address='localhost', interval=1):
+        """ Start local HTTP endpoint that exposes live statistics in Prometheus text format on /metrics.
+
+        Ports, streams and TPLDs statistics are polled in the background (see start_stats_poller) and scrapes are
+        served from the latest sample so they never trigger chassis queries.
+
+        :param port: TCP port to listen on, 0 - any free port (see server.port).
+        :param address: address to listen on.
+        :param interval: statistics polling interval in seconds.
+        :return: running server, stopped on disconnect or explicitly with server.stop().
+        :rtype: xenavalkyrie.xena_statistics_http.XenaStatsHttpServer
+        """
+
+        if self.metrics_server:
+            self.metrics_server.stop()
+        self.metrics_server = XenaStatsHttpServer(self, port, address, interval)
+        self.metrics_server.start()
+        return self.metrics_server
+
     def start_capture(self, *ports):
         """ Start capture on list of ports.
 
@@ -463,6 +519,34 @@ class XenaChassis(XenaObject):
         """
         raise NotImplementedError('Bug in chassis when trying to read c_statsession')
 
+    def read_ports_stats(self, *ports, **kwargs):
+        """ Read statistics snapshot of list of ports.
+
+        All requested statistics groups of all ports are pipelined in a single write/read cycle so all counters are
+        read at (almost) the same instant.
+
+        :param ports: list of ports to read statistics. Default - all chassis ports.
+        :param captions: keyword only - dictionary {group name: [stat names]} of statistics to read, only the groups in
+            captions are queried. Default - all statistics.
+        :return: dictionary {port: {group name {stat name: value}}}. See XenaBasePort.stats_captions.
+        """
+
+        captions = kwargs.pop('captions', None)
+        if kwargs:
+            raise TypeError('Unexpected arguments {}'.format(list(kwargs)))
+        ports = self._get_operation_ports(*ports)
+        obj_stat_names = [(port, stat_name) for port in ports for stat_name in
+                          (captions if captions else port.stats_captions)]
+        values = self.api.get_multi_stats(obj_stat_names)
+
+        statistics = XenaObjectsDict()
+        offset = 0
+        for port in ports:
+            num_groups = len(captions if captions else port.stats_captions)
+            statistics[port] = port.stats_with_captions(values[offset:offset + num_groups], captions)
+            offset += num_groups
+        return statistics
+
     def save_config(self, config_file_name):
         """ Save entire chassis configuration file.
 
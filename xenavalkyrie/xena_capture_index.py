@@ -0,0 +1,224 @@
+"""
+Classes and utilities to index downloaded captures by TPLD ID, VLAN and flow (5-tuple).
+
+The index keeps, per packet, its timestamp and offset in the pcap file, and per key the list of packet numbers in
+capture order, so per stream queries, first/last packet and sequence gaps analysis are lookups instead of scans.
+The index is saved as JSON next to the pcap file (<pcap file>.idx) and can be reloaded without reading the capture.
+
+:author: yoram@ignissoft.com
+"""
+
+import io
+import json
+import struct
+from array import array
+
+from xenavalkyrie.xena_pcap import read_pcap
+from xenavalkyrie.xena_pcap_analyzer import PcapAnalyzer, packet_layout
+
+# Python 2 array has no 'Q' type code - use 'L' where it is 64 bit (LP64 platforms) and double (exact up to 2**53)
+# where it is 32 bit.
+try:
+    _uint64 = array('Q').typecode
+except ValueError:
+    _uint64 = 'L' if array('L').itemsize == 8 else 'd'
+
+
+class XenaCaptureIndex(object):
+    """ Index of captured packets by TPLD ID, VLAN ID and flow. """
+
+    def __init__(self, pcap_file=None):
+        """
+        :param pcap_file: indexed pcap/pcapng file, required to read packets by number.
+        """
+
+        self.pcap_file = pcap_file
+        self.timestamps = array(_uint64)
+        self.offsets = array(_uint64)
+        self.lengths = array('I')
+        #: {TPLD ID: packet numbers}
+        self.tplds = {}
+        #: {TPLD ID: sequence numbers}, ordered as tplds packet numbers.
+        self.sequences = {}
+        #: {outer VLAN ID: packet numbers}
+        self.vlans = {}
+        #: {(source IP, destination IP, IP protocol, source port, destination port): packet numbers}
+        #: IPv4 addresses are dotted quads, IPv6 addresses are eight uncompressed hex groups (0:0:0:0:0:0:0:1).
+        self.flows = {}
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @classmethod
+    def build(cls, pcap_file):
+        """ Build index of pcap/pcapng file.
+
+        :param pcap_file: pcap/pcapng file to index.
+        :return: new index.
+        """
+
+        index = cls(pcap_file)
+        for timestamp, packet, offset in read_pcap(pcap_file, offsets=True):
+            index.add(packet, timestamp, offset)
+        return index
+
+    @classmethod
+    def load(cls, file_name):
+        """ Load index saved with save.
+
+        :param file_name: index file name.
+        :return: loaded index.
+        """
+
+        with open(file_name, 'r') as f:
+            data = json.load(f)
+        index = cls(data['pcap_file'])
+        index.timestamps.extend(data['timestamps'])
+        index.offsets.extend(data['offsets'])
+        index.lengths.extend(data['lengths'])
+        for attribute in ('tplds', 'sequences', 'vlans'):
+            getattr(index, attribute).update((int(k), array('I', v)) for k, v in data[attribute].items())
+        for flow, numbers in data['flows']:
+            index.flows[tuple(flow)] = array('I', numbers)
+        return index
+
+    def save(self, file_name=None):
+        """ Save index as JSON.
+
+        :param file_name: index file name. If None - <pcap file>.idx.
+        :return: index file name.
+        """
+
+        file_name = file_name if file_name else self.pcap_file + '.idx'
+        data = {'pcap_file': self.pcap_file,
+                'timestamps': self.timestamps.tolist(),
+                'offsets': self.offsets.tolist(),
+                'lengths': self.lengths.tolist(),
+                'flows': [[list(flow), numbers.tolist()] for flow, numbers in self.flows.items()]}
+        for attribute in ('tplds', 'sequences', 'vlans'):
+            data[attribute] = dict((str(k), v.tolist()) for k, v in getattr(self, attribute).items())
+        with open(file_name, 'w') as f:
+            json.dump(data, f)
+        return file_name
+
+    def add(self, packet, timestamp=0, offset=0):
+        """ Add next packet to the index.
+
+        :param packet: packet bytes.
+        :param timestamp: packet timestamp in nanoseconds.
+        :param offset: packet bytes offset in the pcap file.
+        """
+
+        number = len(self.timestamps)
+        self.timestamps.append(timestamp)
+        self.offsets.append(offset)
+        self.lengths.append(len(packet))
+
+        vlans, ether_type, ip_header_len, proto = packet_layout(packet)
+        if vlans:
+            vlan = struct.unpack_from('>H', packet, vlans[0])[0] & 0x0fff
+            self.vlans.setdefault(vlan, array('I')).append(number)
+        l3 = 14 + 4 * len(vlans)
+        if ip_header_len:
+            size, src_offset = (4, l3 + 12) if ether_type == 0x0800 else (16, l3 + 8)
+            src = _ip_str(packet[src_offset:src_offset + size])
+            dst = _ip_str(packet[src_offset + size:src_offset + 2 * size])
+            l4 = l3 + ip_header_len
+            sport, dport = 0, 0
+            if proto in (6, 17) and len(packet) >= l4 + 4:
+                sport, dport = struct.unpack_from('>HH', packet, l4)
+            self.flows.setdefault((src, dst, proto, sport, dport), array('I')).append(number)
+
+        tpld = self._tpld(packet, l3)
+        if tpld:
+            tpld_id, sequence = tpld
+            self.tplds.setdefault(tpld_id, array('I')).append(number)
+            self.sequences.setdefault(tpld_id, array('I')).append(sequence)
+
+    def lookup(self, tpld_id=None, vlan=None, flow=None):
+        """ Get packets that match all specified keys.
+
+        :param tpld_id: TPLD ID.
+        :param vlan: outer VLAN ID.
+        :param flow: (source IP, destination IP, IP protocol, source port, destination port).
+        :return: sorted list of packet numbers.
+        """
+
+        keys = [(self.tplds, tpld_id), (self.vlans, vlan), (self.flows, flow and tuple(flow))]
+        numbers = None
+        for keys_index, key in keys:
+            if key is None:
+                continue
+            key_numbers = set(keys_index.get(key, []))
+            numbers = key_numbers if numbers is None else numbers & key_numbers
+        return sorted(numbers) if numbers is not None else list(range(len(self)))
+
+    def first(self, tpld_id=None, vlan=None, flow=None):
+        """
+        :return: number of the first packet that matches all specified keys, None if no packet matches.
+        """
+
+        numbers = self.lookup(tpld_id, vlan, flow)
+        return numbers[0] if numbers else None
+
+    def last(self, tpld_id=None, vlan=None, flow=None):
+        """
+        :return: number of the last packet that matches all specified keys, None if no packet matches.
+        """
+
+        numbers = self.lookup(tpld_id, vlan, flow)
+        return numbers[-1] if numbers else None
+
+    def gaps(self, tpld_id):
+        """ Find sequence gaps (lost, duplicated or reordered packets) of TPLD.
+
+        :param tpld_id: TPLD ID.
+        :return: list of (packet number, expected sequence, received sequence).
+        """
+
+        numbers = self.tplds.get(tpld_id, [])
+        sequences = self.sequences.get(tpld_id, [])
+        mask = PcapAnalyzer.tpld_fields['xena.seq'][2]
+        gaps = []
+        for i in range(1, len(sequences)):
+            expected = (sequences[i - 1] + 1) & mask
+            if sequences[i] != expected:
+                gaps.append((numbers[i], expected, sequences[i]))
+        return gaps
+
+    def packet(self, number):
+        """
+        :param number: packet number.
+        :return: packet bytes, read from the pcap file.
+        """
+
+        with io.open(self.pcap_file, 'rb') as f:
+            f.seek(self.offsets[number])
+            return f.read(self.lengths[number])
+
+    #
+    # Private methods.
+    #
+
+    def _tpld(self, packet, l3):
+        """
+        :return: (TPLD ID, sequence) or None if packet is too short to carry TPLD.
+        """
+
+        tpld_offset = PcapAnalyzer.tpld_size + PcapAnalyzer.tpld_end_offset
+        if len(packet) < l3 + tpld_offset:
+            return None
+        values = []
+        for field in ('xena.tpld_id', 'xena.seq'):
+            offset, size, mask = PcapAnalyzer.tpld_fields[field]
+            end = len(packet) - tpld_offset + offset + size
+            values.append(struct.unpack_from('>I', packet, end - 4)[0] & mask)
+        return tuple(values)
+
+
+def _ip_str(address):
+    """ Format IP address without socket.inet_ntop, which is not available on Python 2 Windows. """
+
+    if len(address) == 4:
+        return '.'.join(str(b) for b in bytearray(address))
+    return ':'.join('{:x}'.format(g) for g in struct.unpack('>8H', address))
@@ -0,0 +1,183 @@
+"""
+Classes and utilities to store downloaded captures in memory mapped file.
+
++--------+---------+------+-------------+--------------+---------------------------+-------------------------+
+| magic  | version | pad  | num packets | index offset | packets bytes (8 aligned) | offsets (num + 1 int64) |
+|        |         |      |             |              |                           | timestamps (num int64)  |
++--------+---------+------+-------------+--------------+---------------------------+-------------------------+
+
+Packet i is packets bytes [offsets[i]:offsets[i + 1]]. Packets are written first, so the store is written while
+packets are downloaded, and the index arrays and header counters are written on close.
+
+Readers map the file read only, so opening a store costs nothing and all processes on the host share the same pages.
+Packets are returned as memoryview slices of the map - no copy. On Python 2, where mmap does not support memoryview,
+packets are returned as bytes copied from the map.
+
+:author: yoram@ignissoft.com
+"""
+
+import io
+import mmap
+import struct
+
+_header = struct.Struct('<8sIIQQ')
+_uint64 = struct.Struct('<Q')
+_magic = b'XENACAPS'
+_version = 1
+
+
+class XenaCaptureStoreWriter(object):
+    """ Write packets into capture store, same interface as XenaPcapWriter. """
+
+    def __init__(self, file_name, buffer_size=64 * 1024):
+        """
+        :param file_name: output file name, existing file is overwritten.
+        :param buffer_size: write buffer size in bytes.
+        """
+
+        self.file_name = file_name
+        self.file = io.open(file_name, 'wb', buffering=buffer_size)
+        self.file.write(_header.pack(_magic, _version, 0, 0, 0))
+        self.num_packets = 0
+        self.size = 0
+        #: packed little endian uint64 index arrays, written on close.
+        self.offsets = bytearray(_uint64.pack(0))
+        self.timestamps = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, packet, timestamp=0, length=None):
+        """ Write single packet.
+
+        :param packet: packet bytes.
+        :param timestamp: packet timestamp in nanoseconds.
+        :param length: not used, for compatibility with XenaPcapWriter.
+        """
+
+        self.file.write(packet)
+        self.size += len(packet)
+        self.num_packets += 1
+        self.offsets += _uint64.pack(self.size)
+        self.timestamps += _uint64.pack(int(timestamp))
+
+    def write_packets(self, packets):
+        """ Write multiple packets.
+
+        :param packets: iterable of packets bytes or (packet, timestamp, length) tuples.
+        """
+
+        for packet in packets:
+            if type(packet) is tuple:
+                self.write(*packet)
+            else:
+                self.write(packet)
+
+    def close(self):
+        """ Write index arrays and header counters and close the file. """
+
+        padding = -self.size % 8
+        self.file.write(b'\x00' * padding)
+        index_offset = _header.size + self.size + padding
+        self.file.write(self.offsets)
+        self.file.write(self.timestamps)
+        self.file.seek(0)
+        self.file.write(_header.pack(_magic, _version, 0, self.num_packets, index_offset))
+        self.file.close()
+
+
+class XenaCaptureStore(object):
+    """ Read only, zero copy, access to capture store. """
+
+    def __init__(self, file_name):
+        """
+        :param file_name: capture store file name, as created by XenaCaptureStoreWriter.
+        """
+
+        self.file_name = file_name
+        self.file = open(file_name, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, num_packets, index_offset = _header.unpack_from(self.mm, 0)
+        if magic != _magic:
+            raise ValueError('{} is not Xena capture store file'.format(file_name))
+        self.num_packets = num_packets
+        try:
+            self.data = memoryview(self.mm)[_header.size:index_offset]
+        except TypeError:
+            # Python 2 - mmap has no new style buffer interface.
+            self.data = None
+        self.offsets = _Uint64Array(self.mm, index_offset, num_packets + 1)
+        self.timestamps = _Uint64Array(self.mm, index_offset + (num_packets + 1) * _uint64.size, num_packets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self.num_packets
+
+    def __getitem__(self, index):
+        """
+        :param index: packet number or slice.
+        :return: packet memoryview (bytes on Python 2), or list of packets for slice.
+        """
+
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.num_packets))]
+        if index < 0:
+            index += self.num_packets
+        if not 0 <= index < self.num_packets:
+            raise IndexError('Packet index {} out of range'.format(index))
+        return self._packet(self.offsets[index], self.offsets[index + 1])
+
+    def __iter__(self):
+        offsets = self.offsets
+        for index in range(self.num_packets):
+            yield self._packet(offsets[index], offsets[index + 1])
+
+    def close(self):
+        """ Release all views and close the map. Packets returned before close must not be used after close. """
+
+        if self.data is not None:
+            self.data.release()
+        try:
+            self.mm.close()
+        except BufferError:
+            # Packets views are still referenced, the map is closed when they are garbage collected.
+            pass
+        self.file.close()
+
+    #
+    # Private methods.
+    #
+
+    def _packet(self, start, end):
+        if self.data is not None:
+            return self.data[start:end]
+        return self.mm[_header.size + start:_header.size + end]
+
+
+class _Uint64Array(object):
+    """ Read only little endian uint64 array inside the map (portable replacement for memoryview.cast('Q')). """
+
+    def __init__(self, buf, offset, size):
+        self.buf = buf
+        self.offset = offset
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.size))]
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError('Index {} out of range'.format(index))
+        return _uint64.unpack_from(self.buf, self.offset + index * _uint64.size)[0]
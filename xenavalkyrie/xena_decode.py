@@ -0,0 +1,73 @@
+"""
+Classes and utilities to decode captured packets in parallel.
+
+Decoders run in worker processes so they must be picklable - module level functions or functools.partial of module
+level functions.
+
+:author: yoram@ignissoft.com
+"""
+
+import functools
+import multiprocessing
+
+from pypacker.layer12.ethernet import Ethernet
+
+
+def decode_summary(packet):
+    """ Default decoder.
+
+    :param packet: packet bytes.
+    :return: dictionary {layers: list of pypacker layer names, length: packet length, src/dst...: layer addresses}.
+    """
+
+    summary = {'length': len(packet), 'layers': []}
+    handler = Ethernet(packet)
+    while handler:
+        layer = str(handler).split('(')[0].lower()
+        summary['layers'].append(layer)
+        for field in ('src_s', 'dst_s', 'sport', 'dport'):
+            value = getattr(handler, field, None)
+            if value is not None:
+                summary['{}.{}'.format(layer, field)] = value
+        handler = handler.body_handler
+    return summary
+
+
+def decode_fields(fields, packet):
+    """ Decoder that returns the requested pypacker fields.
+
+    :param fields: list of dotted pypacker attributes relative to Ethernet, for example ['src_s', 'ip.dst_s'].
+    :param packet: packet bytes.
+    :return: dictionary {field: value}, value is None if the packet does not have the field.
+    """
+
+    eth = Ethernet(packet)
+    values = {}
+    for field in fields:
+        value = eth
+        for attribute in field.split('.'):
+            value = getattr(value, attribute, None)
+            if value is None:
+                break
+        values[field] = value
+    return values
+
+
+def decode_packets(packets, decoder=decode_summary, fields=None, workers=None, chunk_size=256):
+    """ Decode packets in process pool.
+
+    :param packets: iterable of packets bytes, can be generator (see XenaCapture.iter_packets).
+    :param decoder: function(packet) that decodes single packet.
+    :param fields: if specified, decode these fields with decode_fields and ignore decoder.
+    :param workers: number of worker processes. If None - number of CPUs.
+    :param chunk_size: number of packets sent to worker process at once.
+    :return: list of decoded packets in packets order.
+    """
+
+    if fields:
+        decoder = functools.partial(decode_fields, fields)
+    pool = multiprocessing.Pool(workers)
+    try:
+        return list(pool.imap(decoder, packets, chunk_size))
+    finally:
+        pool.terminate()
@@ -157,6 +157,24 @@ class XenaObject(TgnObject):
     def read_stat(self, captions, stat_name):
         return dict(zip(captions, self.api.get_stats(self, stat_name)))
 
+    def stats_with_captions(self, values, captions=None):
+        """ Build statistics dictionary from raw counters values.
+
+        :param values: list of counters lists, ordered as captions groups.
+        :param captions: dictionary {group name: [stat names]}, subset of object stats_captions. Default - all.
+        :return: dictionary {group name {stat name: value}}.
+        """
+
+        captions = captions if captions else self.stats_captions
+        stats_with_captions = OrderedDict()
+        for (group_name, stat_names), group_values in zip(captions.items(), values):
+            all_stat_names = self.stats_captions[group_name]
+            if stat_names == all_stat_names:
+                stats_with_captions[group_name] = dict(zip(stat_names, group_values))
+            else:
+                stats_with_captions[group_name] = dict((n, group_values[all_stat_names.index(n)]) for n in stat_names)
+        return stats_with_captions
+
     #
     # Private methods.
     #
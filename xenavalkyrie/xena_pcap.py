@@ -0,0 +1,230 @@
+"""
+Classes and utilities to write and read captured packets in pcap, pcapng and text (hexdump) formats.
+
+Files are written directly from the packets bytes, with no external tools. All fields are written little endian so the
+output is identical on all platforms. Timestamps are in nanoseconds (pcap nanosecond magic, pcapng if_tsresol=9).
+
+Text format is offset prefixed hexdump, 16 bytes per row, as expected by text2pcap.
+
+:author: yoram@ignissoft.com
+"""
+
+import io
+import re
+import sys
+import struct
+import binascii
+import operator
+
+LINKTYPE_ETHERNET = 1
+
+_pcap_header = struct.Struct('<IHHiIII')
+_pcap_record = struct.Struct('<IIII')
+_pcap_magic_ns = 0xa1b23c4d
+_pcap_magic_us = 0xa1b2c3d4
+_pcapng_shb = 0x0a0d0d0a
+# Rows prefixes (new line and offset) of the largest packet (snaplen), precomputed so hexdump is thread safe.
+_row_prefixes = tuple('\n{:06x} '.format(row * 16) for row in range(65536 // 16))
+
+
+def hexdump(packet, f=None):
+    """ Format packet as hexdump - rows of 6 digits offset and 16 bytes, each row starts with new line.
+
+    :param packet: packet bytes.
+    :param f: if specified, hexdump is written into this text file object instead of returned.
+    :return: packet hexdump, None if f is specified.
+    """
+
+    spaced_hex = _spaced_hex(packet)
+    num_rows = (len(packet) + 15) // 16
+    row_prefixes = _row_prefixes
+    if num_rows > len(row_prefixes):
+        row_prefixes = ['\n{:06x} '.format(row * 16) for row in range(num_rows)]
+    rows = map(operator.add, row_prefixes[:num_rows], [spaced_hex[i:i + 47] for i in range(0, len(spaced_hex), 48)])
+    text = ''.join(rows)
+    if f:
+        f.write(text)
+    else:
+        return text
+
+
+if sys.version_info >= (3, 8):
+    def _spaced_hex(packet):
+        return packet.hex(' ').upper()
+else:
+    def _spaced_hex(packet):
+        return ' '.join(re.findall('..', binascii.hexlify(packet).decode('utf-8').upper()))
+
+
+class XenaPcapWriter(object):
+    """ Write packets into pcap file, one record per write. """
+
+    def __init__(self, file_name, snaplen=65535, linktype=LINKTYPE_ETHERNET, buffer_size=64 * 1024):
+        """ Create file and write file header.
+
+        :param file_name: output file name, existing file is overwritten.
+        :param snaplen: maximum packet length.
+        :param linktype: link layer type of all packets.
+        :param buffer_size: write buffer size in bytes.
+        """
+
+        self.file_name = file_name
+        self.snaplen = snaplen
+        self.linktype = linktype
+        self.file = io.open(file_name, 'wb', buffering=buffer_size)
+        self.num_packets = 0
+        self._write_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, packet, timestamp=0, length=None):
+        """ Write single packet.
+
+        :param packet: packet bytes.
+        :param timestamp: packet timestamp in nanoseconds.
+        :param length: packet original length, if different than the captured packet length.
+        """
+
+        packet = packet[:self.snaplen]
+        self._write_packet(packet, int(timestamp), max(length or 0, len(packet)))
+        self.num_packets += 1
+
+    def write_packets(self, packets):
+        """ Write multiple packets.
+
+        :param packets: iterable of packets bytes or (packet, timestamp, length) tuples.
+        """
+
+        for packet in packets:
+            if type(packet) is tuple:
+                self.write(*packet)
+            else:
+                self.write(packet)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    #
+    # Private methods.
+    #
+
+    def _write_header(self):
+        self.file.write(_pcap_header.pack(_pcap_magic_ns, 2, 4, 0, 0, self.snaplen, self.linktype))
+
+    def _write_packet(self, packet, timestamp, length):
+        seconds, nanoseconds = divmod(timestamp, 1000000000)
+        self.file.write(_pcap_record.pack(seconds & 0xffffffff, nanoseconds, len(packet), length))
+        self.file.write(packet)
+
+
+class XenaPcapngWriter(XenaPcapWriter):
+    """ Write packets into pcapng file - section header, single interface and enhanced packet block per packet. """
+
+    def _write_header(self):
+        shb_body = struct.pack('<IHHq', 0x1a2b3c4d, 1, 0, -1)
+        self._write_block(0x0a0d0d0a, shb_body)
+        # Options - if_tsresol = 9 (nanoseconds), end of options.
+        idb_body = struct.pack('<HHI', self.linktype, 0, self.snaplen) + struct.pack('<HHB3x', 9, 1, 9) + b'\x00' * 4
+        self._write_block(0x00000001, idb_body)
+
+    def _write_packet(self, packet, timestamp, length):
+        timestamp &= 0xffffffffffffffff
+        epb_body = struct.pack('<IIIII', 0, timestamp >> 32, timestamp & 0xffffffff, len(packet), length)
+        self._write_block(0x00000006, epb_body, packet)
+
+    def _write_block(self, block_type, body, data=b''):
+        padding = b'\x00' * (-len(data) % 4)
+        total_length = 12 + len(body) + len(data) + len(padding)
+        self.file.write(struct.pack('<II', block_type, total_length))
+        self.file.write(body)
+        self.file.write(data)
+        self.file.write(padding)
+        self.file.write(struct.pack('<I', total_length))
+
+
+def read_pcap(file_name, offsets=False):
+    """ Generator that reads pcap or pcapng file record by record.
+
+    :param file_name: pcap or pcapng file name.
+    :param offsets: True - also return the packet bytes offset in the file.
+    :return: (timestamp in nanoseconds, packet bytes) or (timestamp, packet bytes, offset) per packet, one packet at a
+        time.
+    """
+
+    with io.open(file_name, 'rb') as f:
+        header = f.read(24)
+        if len(header) < 24:
+            return
+        if struct.unpack('<I', header[:4])[0] == _pcapng_shb:
+            f.seek(0)
+            records = _read_pcapng_records(f)
+        else:
+            records = _read_pcap_records(f, header)
+        for record in records:
+            yield record if offsets else record[:2]
+
+
+def _read_pcap_records(f, header):
+    for endian in '<>':
+        magic = struct.unpack(endian + 'I', header[:4])[0]
+        if magic in (_pcap_magic_ns, _pcap_magic_us):
+            break
+    else:
+        raise ValueError('{} is not pcap or pcapng file'.format(f.name))
+    multiplier = 1 if magic == _pcap_magic_ns else 1000
+    record = struct.Struct(endian + 'IIII')
+    while True:
+        record_header = f.read(record.size)
+        if len(record_header) < record.size:
+            return
+        seconds, fraction, caplen, _ = record.unpack(record_header)
+        offset = f.tell()
+        yield seconds * 1000000000 + fraction * multiplier, f.read(caplen), offset
+
+
+def _read_pcapng_records(f):
+    endian = '<'
+    interfaces_resolution = []
+    while True:
+        block_offset = f.tell()
+        block_header = f.read(8)
+        if len(block_header) < 8:
+            return
+        block_type = struct.unpack(endian + 'I', block_header[:4])[0]
+        if block_type == _pcapng_shb:
+            byte_order = f.read(4)
+            endian = '<' if struct.unpack('<I', byte_order)[0] == 0x1a2b3c4d else '>'
+            total_length = struct.unpack(endian + 'I', block_header[4:])[0]
+            body = byte_order + f.read(total_length - 12)
+            interfaces_resolution = []
+        else:
+            total_length = struct.unpack(endian + 'I', block_header[4:])[0]
+            body = f.read(total_length - 8)
+        if block_type == 0x00000001:
+            interfaces_resolution.append(_pcapng_ts_resolution(body, endian))
+        elif block_type == 0x00000006:
+            interface, ts_high, ts_low, caplen, _ = struct.unpack_from(endian + 'IIIII', body)
+            timestamp = ((ts_high << 32) + ts_low) * 1000000000 // interfaces_resolution[interface]
+            yield timestamp, body[20:20 + caplen], block_offset + 28
+
+
+def _pcapng_ts_resolution(idb_body, endian):
+    """ Parse IDB options and return number of timestamp units per second (default microseconds). """
+
+    offset = 8
+    while offset + 4 <= len(idb_body) - 4:
+        code, length = struct.unpack_from(endian + 'HH', idb_body, offset)
+        if code == 0:
+            break
+        if code == 9:
+            tsresol = struct.unpack_from('B', idb_body, offset + 4)[0]
+            return 2 ** (tsresol & 0x7f) if tsresol & 0x80 else 10 ** tsresol
+        offset += 4 + length + (-length % 4)
+    return 1000000
@@ -0,0 +1,261 @@
+"""
+Pure Python pcap fields extractor - fast alternative to Tshark/TsharkAnalyzer for common L2-L4 and Xena TPLD fields.
+
+The analyzer has the same add_field/set_read_filter interface as TsharkAnalyzer and returns the same format -
+{field: list of values} per packet, with tshark field names and value formats. The xena.* TPLD fields are analyzer only
+fields - tshark has no Xena dissector, so these fields cannot be used with TsharkAnalyzer.
+
+For each packet layout (VLAN tags, ether type, IP header length and protocol) the analyzer builds, once, an offsets
+plan - list of (field, extractor) with all offsets precomputed, so each packet is parsed with few struct calls.
+
+Read filter supports simple tshark display filters - comparisons (==, !=, >, <, >=, <= or eq, ne, gt, lt, ge, le)
+and protocols/fields presence, combined with && (and) and || (or), no parentheses.
+
+:author: yoram@ignissoft.com
+"""
+
+import re
+import socket
+import struct
+
+from xenavalkyrie.xena_pcap import read_pcap
+
+_vlan_types = (0x8100, 0x88a8, 0x9100)
+
+_ops = {'==': lambda a, b: a == b,
+        '!=': lambda a, b: a != b,
+        '>': lambda a, b: a > b,
+        '<': lambda a, b: a < b,
+        '>=': lambda a, b: a >= b,
+        '<=': lambda a, b: a <= b}
+_ops.update({'eq': _ops['=='], 'ne': _ops['!='], 'gt': _ops['>'], 'lt': _ops['<'], 'ge': _ops['>='],
+             'le': _ops['<=']})
+
+_term_re = re.compile(r'^\s*([\w.]+)\s*(?:(==|!=|>=|<=|>|<|eq|ne|gt|lt|ge|le)\s*(\S+))?\s*$')
+
+
+class PcapAnalyzer(object):
+    """ Extract fields from pcap/pcapng files in Python. """
+
+    #: Xena test payload (TPLD) location, relative to the packet end (FCS included in Xena captures), and TPLD fields
+    #: as (offset, size in bytes up to 4, mask). Default TPLD - 24 bits sequence at offset 0, 12 bits TPLD ID at offset
+    #: 8, first packet flag at offset 10. Change for other TPLD types.
+    tpld_size = 20
+    tpld_end_offset = 4
+    tpld_fields = {'xena.seq': (0, 3, 0xffffff),
+                   'xena.tpld_id': (8, 2, 0x0fff)}
+
+    fields_names = ('frame.number', 'frame.len', 'frame.time_epoch',
+                    'eth', 'eth.dst', 'eth.src', 'eth.type',
+                    'vlan', 'vlan.id', 'vlan.priority', 'vlan.etype',
+                    'ip', 'ip.src', 'ip.dst', 'ip.proto', 'ip.ttl', 'ip.len', 'ip.id', 'ip.dsfield',
+                    'ipv6', 'ipv6.src', 'ipv6.dst', 'ipv6.nxt', 'ipv6.hlim',
+                    'udp', 'udp.srcport', 'udp.dstport', 'udp.length',
+                    'tcp', 'tcp.srcport', 'tcp.dstport', 'tcp.flags',
+                    'xena', 'xena.seq', 'xena.tpld_id')
+
+    def __init__(self):
+        self.read_filter = None
+        self.fields = []
+        self._filter = []
+        self._plans = {}
+
+    def set_read_filter(self, read_filter):
+        """
+        :param read_filter: simple tshark display filter, for example 'ip.dst == 1.1.0.1 && frame.number >= 10'.
+        """
+
+        self._filter = []
+        for or_term in re.split(r'\|\||\bor\b', read_filter) if read_filter else []:
+            and_terms = []
+            for term in re.split(r'&&|\band\b', or_term):
+                match = _term_re.match(term)
+                if not match:
+                    raise ValueError('Unsupported read filter term "{}"'.format(term.strip()))
+                field, op, value = match.groups()
+                self._check_field(field)
+                and_terms.append((field, _ops[op] if op else None, value))
+            self._filter.append(and_terms)
+        self.read_filter = read_filter
+        self._plans = {}
+
+    def add_field(self, field):
+        self._check_field(field)
+        self.fields.append(field)
+        self._plans = {}
+
+    def analyze(self, pcap_file):
+        """
+        :param pcap_file: pcap or pcapng file to analyze.
+        :return: list of {field: list of values} per packet that matches the read filter.
+        """
+
+        return list(self.iter_analyze(pcap_file))
+
+    def iter_analyze(self, pcap_file):
+        """ Generator version of analyze, reads the file record by record.
+
+        :param pcap_file: pcap or pcapng file to analyze.
+        :return: {field: list of values} per packet that matches the read filter, one packet at a time.
+        """
+
+        for number, (timestamp, packet) in enumerate(read_pcap(pcap_file), 1):
+            plan = self._get_plan(packet)
+            try:
+                values = {field: extractor(packet, number, timestamp) for field, extractor in plan}
+            except struct.error:
+                values = {field: _truncated(extractor, packet, number, timestamp) for field, extractor in plan}
+            if self._filter and not self._match(values):
+                continue
+            yield {field: values[field] if values[field] else [''] for field in self.fields}
+
+    #
+    # Private methods.
+    #
+
+    def _check_field(self, field):
+        if field not in self.fields_names:
+            raise ValueError('Unsupported field {}, supported fields - {}'.format(field, self.fields_names))
+
+    def _match(self, values):
+        for and_terms in self._filter:
+            for field, op, value in and_terms:
+                if not values[field]:
+                    break
+                if op and not any(op(*_comparable(v, value)) for v in values[field]):
+                    break
+            else:
+                return True
+        return False
+
+    def _get_plan(self, packet):
+        layout = packet_layout(packet)
+        plan = self._plans.get(layout)
+        if plan is None:
+            fields = set(self.fields) | set(t[0] for and_terms in self._filter for t in and_terms)
+            extractors = self._build_extractors(*layout)
+            plan = [(field, extractors.get(field, _absent)) for field in fields]
+            self._plans[layout] = plan
+        return plan
+
+    def _build_extractors(self, vlans, ether_type, ip_header_len, proto):
+        l3 = 14 + 4 * len(vlans)
+        extractors = {'frame.number': lambda p, n, t: [str(n)],
+                      'frame.len': lambda p, n, t: [str(len(p))],
+                      'frame.time_epoch': lambda p, n, t: ['{}.{:09d}'.format(*divmod(t, 1000000000))],
+                      'eth': lambda p, n, t: ['eth'],
+                      'eth.dst': _mac(0),
+                      'eth.src': _mac(6),
+                      'eth.type': _uint(12, 'H', '0x{:04x}')}
+        if vlans:
+            extractors['vlan'] = lambda p, n, t: ['vlan']
+            extractors['vlan.id'] = lambda p, n, t: [str(struct.unpack_from('>H', p, o)[0] & 0x0fff) for o in vlans]
+            extractors['vlan.priority'] = lambda p, n, t: [str(struct.unpack_from('>B', p, o)[0] >> 5) for o in vlans]
+            extractors['vlan.etype'] = lambda p, n, t: ['0x{:04x}'.format(struct.unpack_from('>H', p, o + 2)[0])
+                                                        for o in vlans]
+        if ether_type == 0x0800 and ip_header_len:
+            extractors.update({'ip': lambda p, n, t: ['ip'],
+                               'ip.dsfield': _uint(l3 + 1, 'B', '0x{:02x}'),
+                               'ip.len': _uint(l3 + 2, 'H'),
+                               'ip.id': _uint(l3 + 4, 'H', '0x{:04x}'),
+                               'ip.ttl': _uint(l3 + 8, 'B'),
+                               'ip.proto': _uint(l3 + 9, 'B'),
+                               'ip.src': _ip(l3 + 12, 4, socket.AF_INET),
+                               'ip.dst': _ip(l3 + 16, 4, socket.AF_INET)})
+        elif ether_type == 0x86dd and ip_header_len:
+            extractors.update({'ipv6': lambda p, n, t: ['ipv6'],
+                               'ipv6.nxt': _uint(l3 + 6, 'B'),
+                               'ipv6.hlim': _uint(l3 + 7, 'B'),
+                               'ipv6.src': _ip(l3 + 8, 16, socket.AF_INET6),
+                               'ipv6.dst': _ip(l3 + 24, 16, socket.AF_INET6)})
+        if ip_header_len and proto in (6, 17):
+            l4 = l3 + ip_header_len
+            l4_name = 'udp' if proto == 17 else 'tcp'
+            extractors.update({l4_name: lambda p, n, t: [l4_name],
+                               l4_name + '.srcport': _uint(l4, 'H'),
+                               l4_name + '.dstport': _uint(l4 + 2, 'H')})
+            if proto == 17:
+                extractors['udp.length'] = _uint(l4 + 4, 'H')
+            else:
+                extractors['tcp.flags'] = lambda p, n, t: ['0x{:03x}'.format(struct.unpack_from('>H', p, l4 + 12)[0] &
+                                                                             0x0fff)]
+        tpld_offset = self.tpld_size + self.tpld_end_offset
+        extractors['xena'] = lambda p, n, t: ['xena'] if len(p) >= l3 + tpld_offset else []
+        for field, (offset, size, mask) in self.tpld_fields.items():
+            extractors[field] = _tpld_field(l3 + tpld_offset, tpld_offset - offset, size, mask)
+        return extractors
+
+
+def packet_layout(packet):
+    """ Packet layout - (VLAN tags offsets, ether type, IP header length, IP protocol). """
+
+    vlans = []
+    offset = 12
+    ether_type = struct.unpack_from('>H', packet, offset)[0] if len(packet) >= 14 else None
+    while ether_type in _vlan_types and len(packet) >= offset + 8:
+        vlans.append(offset + 2)
+        offset += 4
+        ether_type = struct.unpack_from('>H', packet, offset)[0]
+    l3 = offset + 2
+    if ether_type == 0x0800 and len(packet) >= l3 + 20:
+        version_ihl, proto = struct.unpack_from('>B8xB', packet, l3)
+        return tuple(vlans), ether_type, (version_ihl & 0x0f) * 4, proto
+    if ether_type == 0x86dd and len(packet) >= l3 + 40:
+        return tuple(vlans), ether_type, 40, struct.unpack_from('>B', packet, l3 + 6)[0]
+    return tuple(vlans), ether_type, None, None
+
+
+def _absent(packet, number, timestamp):
+    return []
+
+
+def _uint(offset, fmt, str_fmt='{}'):
+    fmt = '>' + fmt
+
+    def extractor(packet, number, timestamp):
+        return [str_fmt.format(struct.unpack_from(fmt, packet, offset)[0])]
+    return extractor
+
+
+def _truncated(extractor, packet, number, timestamp):
+    try:
+        return extractor(packet, number, timestamp)
+    except struct.error:
+        return []
+
+
+def _mac(offset):
+
+    def extractor(packet, number, timestamp):
+        return ['{:02x}:{:02x}:{:02x}:{:02x}:{:02x}:{:02x}'.format(*struct.unpack_from('>6B', packet, offset))]
+    return extractor
+
+
+def _ip(offset, size, family):
+
+    def extractor(packet, number, timestamp):
+        if len(packet) < offset + size:
+            return []
+        return [socket.inet_ntop(family, packet[offset:offset + size])]
+    return extractor
+
+
+def _tpld_field(min_len, offset_from_end, size, mask):
+    """ TPLD field of up to 4 bytes - read 4 bytes that end with the field end and mask. """
+
+    offset_from_end -= size - 4
+
+    def extractor(packet, number, timestamp):
+        if len(packet) < min_len:
+            return []
+        return [str(struct.unpack_from('>I', packet, len(packet) - offset_from_end)[0] & mask)]
+    return extractor
+
+
+def _comparable(value, filter_value):
+    """ Convert to ints if both values are numbers, else to lower case strings (MAC addresses). """
+
+    try:
+        return int(value, 0), int(filter_value, 0)
+    except ValueError:
+        return value.lower(), filter_value.lower()
@@ -4,23 +4,36 @@ Classes and utilities that represents Xena XenaManager-2G port.
 :author: yoram@ignissoft.com
 """
 
-import os
 import re
 import math
+import binascii
+import threading
 
 from collections import OrderedDict
 from enum import Enum
 
+try:
+    from queue import Queue, Full
+except ImportError:
+    from Queue import Queue, Full
+
 from xenavalkyrie.api.xena_socket import XenaCommandError
+from xenavalkyrie.api.xena_cli import XenaCliWrapper
 from xenavalkyrie.xena_object import XenaObject, XenaObject21
-from xenavalkyrie.xena_stream import XenaStream, XenaStreamState
+from xenavalkyrie.xena_stream import XenaStream, XenaStreamState, parse_streams_config
 from xenavalkyrie.xena_filter import XenaFilterState, XenaFilter, XenaMatch, XenaLength
+from xenavalkyrie.xena_pcap import XenaPcapWriter, XenaPcapngWriter, hexdump
+from xenavalkyrie.xena_decode import decode_packets, decode_summary
+from xenavalkyrie.xena_capture_index import XenaCaptureIndex
+from xenavalkyrie.xena_capture_store import XenaCaptureStoreWriter
 
 
 class XenaCaptureBufferType(Enum):
     raw = 0
     text = 1
     pcap = 2
+    pcapng = 3
+    store = 4
 
 
 class XenaBasePort(XenaObject):
@@ -57,6 +70,9 @@ class XenaBasePort(XenaObject):
         self._data['name'] = '{}/{}'.format(parent.name, index)
         self.p_info = None
         self._capabilities = None
+        self._max_tid = None
+        #: True after port streams were read from the chassis, so port with no streams is not queried again.
+        self._streams_discovered = False
 
     def inventory(self):
         self.p_info = self.get_attributes()
@@ -65,6 +81,7 @@ class XenaBasePort(XenaObject):
         """ Reset port-level parameters to standard values, and delete all streams, filters, capture,
             and dataset definitions.
         """
+        self._forget_streams()
         self.objects = OrderedDict()
         return self.send_command('p_reset')
 
@@ -81,6 +98,8 @@ class XenaBasePort(XenaObject):
         :param config_file_name: full path to the configuration file.
         """
 
+        # The configuration replaces the port streams, discover them again on next access.
+        self._forget_streams()
         with open(config_file_name) as f:
             commands = f.read().splitlines()
 
@@ -117,12 +136,51 @@ class XenaBasePort(XenaObject):
 
         stream = XenaStream(parent=self, index='{}/{}'.format(self.index, len(self.streams)), name=name)
         stream._create()
-        tpld_id = tpld_id if tpld_id != None else XenaStream.next_tpld_id
-        stream.set_attributes(ps_comment='"{}"'.format(stream.name), ps_tpldid=tpld_id)
-        XenaStream.next_tpld_id = max(XenaStream.next_tpld_id + 1, tpld_id + 1)
+        stream._tpld_id = self._allocate_tpld_id(tpld_id)
+        stream.set_attributes(ps_comment='"{}"'.format(stream.name), ps_tpldid=stream._tpld_id)
         stream.set_state(state)
         return stream
 
+    def add_streams(self, specs, batch_size=100):
+        """ Add multiple streams - allocate indices and TPLD IDs per batch and pipeline all batch creation commands.
+
+        Each stream spec is a dictionary with optional keys:
+        name - stream description.
+        tpld_id - TPLD ID. If None the a unique value will be set.
+        state - new stream state (xenavalkyrie.xena_stream.XenaStreamState), default enabled.
+        headers - packet headers (pypacker.layer12.ethernet.Ethernet), see XenaStream.set_packet_headers.
+        l4_checksum - True - set tcp/udp checksum flag (only with headers).
+        Any other key is stream attribute to set, for example ps_ratepps=1000, ps_packetlimit=8000. Attributes are set
+        in spec order if spec is OrderedDict, else in sorted order.
+
+        Streams are created and TPLD IDs are allocated one batch at a time. If a batch fails, its streams are deleted
+        and their TPLD IDs are freed, streams of previous batches are kept.
+
+        :param specs: list of streams specs.
+        :param batch_size: number of streams to create in single write.
+        :return: newly created streams, ordered as specs.
+        :rtype: list of xenavalkyrie.xena_stream.XenaStream
+        """
+
+        next_index = max(self.streams.keys()) + 1 if self.streams else 0
+        streams = []
+        for start in range(0, len(specs), batch_size):
+            batch_streams = []
+            streams_commands = []
+            try:
+                for spec in specs[start:start + batch_size]:
+                    index = '{}/{}'.format(self.index, next_index)
+                    stream = XenaStream(parent=self, index=index, name=spec.get('name'))
+                    next_index += 1
+                    batch_streams.append(stream)
+                    streams_commands.append((stream, self._stream_attributes(stream, spec)))
+                self._create_streams(streams_commands)
+            except Exception:
+                self._remove_streams(batch_streams)
+                raise
+            streams.extend(batch_streams)
+        return streams
+
     def remove_stream(self, index):
         """ Remove stream.
 
@@ -239,16 +297,15 @@ class XenaBasePort(XenaObject):
         self.send_command('pt_clear')
         self.send_command('pr_clear')
 
-    def read_port_stats(self):
-        """
+    def read_port_stats(self, captions=None):
+        """ Read all statistics groups in a single write/read cycle.
+
+        :param captions: dictionary {group name: [stat names]} of statistics to read. Default - all statistics.
         :return: dictionary {group name {stat name: value}}.
             Sea XenaBasePort.stats_captions.
         """
 
-        stats_with_captions = OrderedDict()
-        for stat_name in self.stats_captions.keys():
-            stats_with_captions[stat_name] = self.read_stat(self.stats_captions[stat_name], stat_name)
-        return stats_with_captions
+        return self.chassis.read_ports_stats(self, captions=captions)[self]
 
     def read_stream_stats(self):
         """
@@ -270,6 +327,86 @@ class XenaBasePort(XenaObject):
             payloads_stats[tpld] = tpld.read_stats()
         return payloads_stats
 
+    #
+    # Private methods.
+    #
+
+    def _allocate_tpld_id(self, tpld_id=None):
+        """
+        :param tpld_id: requested TPLD ID. If None - allocate the lowest free TPLD ID.
+        :return: stream TPLD ID, reserved in the session TPLD IDs allocator.
+        """
+
+        if tpld_id is None:
+            if self._max_tid is None:
+                self._max_tid = self.capabilities.values['maxtid']
+            return self.session.tpld_ids.allocate(self._max_tid)
+        self.session.tpld_ids.reserve(tpld_id)
+        return tpld_id
+
+    def _stream_attributes(self, stream, spec):
+        """
+        :return: list of (attribute, value) to create stream from add_streams spec, TPLD ID is allocated.
+        """
+
+        spec = spec.copy()
+        spec.pop('name', None)
+        tpld_id = spec.pop('tpld_id', None)
+        state = spec.pop('state', XenaStreamState.enabled)
+        headers = spec.pop('headers', None)
+        l4_checksum = spec.pop('l4_checksum', False)
+
+        stream._tpld_id = self._allocate_tpld_id(tpld_id)
+        attributes = [('ps_comment', '"{}"'.format(stream.name)), ('ps_tpldid', stream._tpld_id)]
+        if headers:
+            ps_headerprotocol, ps_packetheader = stream._encode_packet_headers(headers, l4_checksum)
+            attributes += [('ps_headerprotocol', ps_headerprotocol), ('ps_packetheader', ps_packetheader)]
+        attributes += list(spec.items()) if isinstance(spec, OrderedDict) else sorted(spec.items())
+        attributes.append(('ps_enable', state.value))
+        return attributes
+
+    def _create_streams(self, streams_commands):
+        """ Create streams on the chassis - single write with CLI API.
+
+        :param streams_commands: list of (stream, [(attribute, value)]).
+        """
+
+        if type(self.api) is not XenaCliWrapper:
+            for stream, attributes in streams_commands:
+                stream._create()
+                for attribute, value in attributes:
+                    stream.set_attributes(**{attribute: value})
+            return
+
+        obj_commands = []
+        for stream, attributes in streams_commands:
+            obj_commands.append((stream, stream.create_command, []))
+            obj_commands.extend((stream, attribute, [value]) for attribute, value in attributes)
+        self.api.send_multi_commands(obj_commands)
+
+    def _remove_streams(self, streams):
+        """ Roll back streams of failed add_streams batch - delete the streams that were created, free their TPLD IDs
+        and remove the objects.
+        """
+
+        for stream in streams:
+            try:
+                stream.send_command('ps_delete')
+            except XenaCommandError:
+                pass
+            if stream._tpld_id is not None and stream._tpld_id >= 0:
+                self.session.tpld_ids.free(stream._tpld_id)
+            XenaObject.del_object_from_parent(stream)
+
+    def _forget_streams(self):
+        """ Free streams TPLD IDs and remove streams objects, without deleting the streams from the chassis. """
+
+        for stream in self.get_objects_by_type('stream'):
+            if stream._tpld_id is not None and stream._tpld_id >= 0:
+                self.session.tpld_ids.free(stream._tpld_id)
+            XenaObject.del_object_from_parent(stream)
+        self._streams_discovered = False
+
     #
     # Properties.
     #
@@ -281,16 +418,15 @@ class XenaBasePort(XenaObject):
         :rtype: dict of (int, xenavalkyrie.xena_stream.XenaStream)
         """
 
-        if not self.get_objects_by_type('stream'):
-            tpld_ids = []
-            for index in self.get_attribute('ps_indices').split():
-                stream = XenaStream(parent=self, index='{}/{}'.format(self.index, index), name=None)
-                ps_comment = stream.get_attribute('ps_comment')
-                if ps_comment:
-                    stream._data['name'] = ps_comment
-                tpld_ids.append(stream.get_attribute('ps_tpldid'))
-            if tpld_ids:
-                XenaStream.next_tpld_id = max([XenaStream.next_tpld_id] + [int(t) for t in tpld_ids]) + 1
+        if not self._streams_discovered:
+            if not self.get_objects_by_type('stream'):
+                streams_config = parse_streams_config(self.send_command_return_multilines('p_fullconfig', '?'))
+                for index, (attributes, modifiers) in streams_config.items():
+                    stream = XenaStream(parent=self, index='{}/{}'.format(self.index, index), name=None)
+                    stream._set_config(attributes, modifiers)
+                    if stream._tpld_id >= 0:
+                        self.session.tpld_ids.reserve(stream._tpld_id)
+            self._streams_discovered = True
         return {s.id: s for s in self.get_objects_by_type('stream')}
 
     @property
@@ -300,10 +436,15 @@ class XenaBasePort(XenaObject):
         :rtype: dict of (int, xenavalkyrie.xena_port.XenaTpld)
         """
 
-        # As TPLDs are dynamic we must re-read them each time from the port.
-        self.parent.del_objects_by_type('tpld')
-        for tpld in self.get_attribute('pr_tplds').split():
-            XenaTpld(parent=self, index='{}/{}'.format(self.index, tpld))
+        # As TPLDs are dynamic we must re-read them each time from the port, but keep existing TPLD objects.
+        tpld_ids = [int(t) for t in self.get_attribute('pr_tplds').split()]
+        tplds = {t.id: t for t in self.get_objects_by_type('tpld')}
+        for tpld_id, tpld in tplds.items():
+            if tpld_id not in tpld_ids:
+                tpld.del_object_from_parent()
+        for tpld_id in tpld_ids:
+            if tpld_id not in tplds:
+                XenaTpld(parent=self, index='{}/{}'.format(self.index, tpld_id))
         return {t.id: t for t in self.get_objects_by_type('tpld')}
 
     @property
@@ -397,10 +538,8 @@ class XenaTpld(XenaObject21):
             Sea XenaTpld.stats_captions.
         """
 
-        stats_with_captions = OrderedDict()
-        for stat_name in self.stats_captions.keys():
-            stats_with_captions[stat_name] = self.read_stat(self.stats_captions[stat_name], stat_name)
-        return stats_with_captions
+        values = self.api.get_multi_stats([(self, stat_name) for stat_name in self.stats_captions])
+        return self.stats_with_captions(values)
 
 
 class XenaCapture(XenaObject):
@@ -428,42 +567,163 @@ class XenaCapture(XenaObject):
 
         :param from_index: index of first packet to read.
         :param to_index: index of last packet to read. If None - read all packets.
-        :param cap_type: returned capture format. If pcap then file name and tshark must be provided.
+        :param cap_type: returned capture format. If pcap, pcapng or store (XenaCaptureStore) then file name must be
+            provided.
         :param file_name: if specified, capture will be saved in file.
-        :param tshark: tshark object for pcap type only.
-        :type: xenavalkyrie.xena_tshark.Tshark
-        :return: list of requested packets, None for pcap type.
+        :param tshark: not used, pcap and pcapng files are written natively. Kept for backward compatibility.
+        :return: list of requested packets, None for pcap, pcapng and store types.
         """
 
-        to_index = to_index if to_index else len(self.packets)
+        to_index = to_index if to_index else self.read_stats()['packets']
+
+        if cap_type in (XenaCaptureBufferType.pcap, XenaCaptureBufferType.pcapng, XenaCaptureBufferType.store):
+            self._save_file(file_name, cap_type, from_index, to_index)
+            return
 
-        raw_packets = []
-        for index in range(from_index, to_index):
-            raw_packets.append(self.packets[index].get_attribute('pc_packet').split('0x')[1])
+        raw_packets = [values[0].split('0x')[1] for values in
+                       self._read_packets_attributes(['pc_packet'], from_index, to_index)]
 
         if cap_type == XenaCaptureBufferType.raw:
             self._save_captue(file_name, raw_packets)
             return raw_packets
 
-        text_packets = []
-        for raw_packet in raw_packets:
-            text_packet = ''
-            for c, b in zip(range(len(raw_packet)), raw_packet):
-                if c % 32 == 0:
-                    text_packet += '\n{:06x} '.format(int(c / 2))
-                elif c % 2 == 0:
-                    text_packet += ' '
-                text_packet += b
-            text_packets.append(text_packet)
-
-        if cap_type == XenaCaptureBufferType.text:
-            self._save_captue(file_name, text_packets)
-            return text_packets
-
-        temp_file_name = file_name + '_'
-        self._save_captue(temp_file_name, text_packets)
-        tshark.text_to_pcap(temp_file_name, file_name)
-        os.remove(temp_file_name)
+        text_packets = [hexdump(binascii.unhexlify(raw_packet)) for raw_packet in raw_packets]
+
+        self._save_captue(file_name, text_packets)
+        return text_packets
+
+    def read_packets(self, from_index=0, to_index=None, window=1000, extra=False, info=False):
+        """ Read captured packets from chassis in bulk.
+
+        Packets are read with pipelined queries, window packets per chassis write, without creating
+        XenaCapturePacket objects.
+
+        :param from_index: index of first packet to read.
+        :param to_index: index of last packet to read (excluded). If None - read all packets.
+        :param window: maximum number of packets to query in single write.
+        :param extra: True - read pc_extra (timestamp, latency, inter frame gap, length) for each packet.
+        :param info: True - read pc_info for each packet.
+        :return: list of packets bytes in index order. If extra or info - list of (packet, extra, info) where extra
+            and info are lists of int values (None if not requested).
+        """
+
+        to_index = to_index if to_index else self.read_stats()['packets']
+        attributes = ['pc_packet'] + (['pc_extra'] if extra else []) + (['pc_info'] if info else [])
+        packets = []
+        for values in self._read_packets_attributes(attributes, from_index, to_index, window):
+            packet = binascii.unhexlify(values[0].split('0x')[1])
+            if not (extra or info):
+                packets.append(packet)
+                continue
+            values = dict(zip(attributes, values))
+            packets.append((packet,
+                            [int(v) for v in values['pc_extra'].split()] if extra else None,
+                            [int(v) for v in values['pc_info'].split()] if info else None))
+        return packets
+
+    def iter_packets(self, from_index=0, to_index=None, window=1000, prefetch=2, extra=False, info=False):
+        """ Generator that yields captured packets while the next windows are downloaded in background thread.
+
+        At most prefetch windows are downloaded ahead of the consumer, so memory is bounded by window * prefetch
+        packets regardless of the capture size.
+
+        :param from_index: index of first packet to read.
+        :param to_index: index of last packet to read (excluded). If None - read all packets.
+        :param window: maximum number of packets to query in single write.
+        :param prefetch: maximum number of windows downloaded ahead of the consumer.
+        :param extra: True - read pc_extra for each packet.
+        :param info: True - read pc_info for each packet.
+        :return: packets in index order, one at a time, in the same format as read_packets.
+        """
+
+        to_index = to_index if to_index else self.read_stats()['packets']
+        windows = Queue(maxsize=prefetch)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    windows.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    pass
+            return False
+
+        def fetch():
+            try:
+                for start in range(from_index, to_index, window):
+                    if not put(self.read_packets(start, min(start + window, to_index), window, extra, info)):
+                        return
+                put(None)
+            except Exception as e:
+                put(e)
+
+        fetcher = threading.Thread(target=fetch)
+        fetcher.daemon = True
+        fetcher.start()
+        try:
+            while True:
+                packets = windows.get()
+                if packets is None:
+                    return
+                if isinstance(packets, Exception):
+                    raise packets
+                for packet in packets:
+                    yield packet
+        finally:
+            stop.set()
+
+    def decode_packets(self, from_index=0, to_index=None, decoder=decode_summary, fields=None, workers=None,
+                       chunk_size=256, window=1000):
+        """ Download captured packets and decode them in process pool, while the next windows are downloaded.
+
+        :param from_index: index of first packet to decode.
+        :param to_index: index of last packet to decode (excluded). If None - decode all packets.
+        :param decoder: picklable function(packet bytes) that decodes single packet.
+        :param fields: if specified, decode only these dotted pypacker fields (see xena_decode.decode_fields).
+        :param workers: number of worker processes. If None - number of CPUs.
+        :param chunk_size: number of packets sent to worker process at once.
+        :param window: maximum number of packets to query in single write.
+        :return: list of decoded packets in index order.
+        """
+
+        packets = self.iter_packets(from_index, to_index, window)
+        return decode_packets(packets, decoder, fields, workers, chunk_size)
+
+    def build_index(self, file_name, from_index=0, to_index=None, cap_type=XenaCaptureBufferType.pcap):
+        """ Download capture into pcap/pcapng file, index it and save the index next to the file.
+
+        :param file_name: pcap/pcapng file name. The index is saved as file_name.idx.
+        :param from_index: index of first packet to download.
+        :param to_index: index of last packet to download. If None - download all packets.
+        :param cap_type: pcap or pcapng.
+        :return: capture index.
+        :rtype: xenavalkyrie.xena_capture_index.XenaCaptureIndex
+        """
+
+        self.get_packets(from_index, to_index, cap_type=cap_type, file_name=file_name)
+        index = XenaCaptureIndex.build(file_name)
+        index.save()
+        return index
+
+    def tail(self, interval=1, window=1000, extra=False, callback=None):
+        """ Start background thread that downloads new packets while capture is running.
+
+        :param interval: pc_stats polling interval in seconds.
+        :param window: maximum number of packets to query in single write.
+        :param extra: True - read pc_extra for each packet.
+        :param callback: if specified, subscribe function(index, packet) to new packets.
+        :return: the running tail thread, call stop() to stop it (after stop_capture to get all packets). Running tails
+            are also stopped on session disconnect.
+        :rtype: xenavalkyrie.xena_port.XenaCaptureTail
+        """
+
+        capture_tail = XenaCaptureTail(self, interval, window, extra)
+        if callback:
+            capture_tail.subscribe(callback)
+        self.session.capture_tails.append(capture_tail)
+        capture_tail.start()
+        return capture_tail
 
     #
     # Properties.
@@ -485,6 +745,46 @@ class XenaCapture(XenaObject):
     # Private methods.
     #
 
+    def _read_packets_attributes(self, attributes, from_index, to_index, window=1000):
+        """
+        :return: list of [attribute value per attribute] per packet, in index order.
+        """
+
+        if type(self.api) is not XenaCliWrapper:
+            return [[self.packets[index].get_attribute(a) for a in attributes] for index in range(from_index, to_index)]
+
+        packets_values = []
+        for start in range(from_index, to_index, window):
+            indices = range(start, min(start + window, to_index))
+            obj_commands = [(self, a, ['[{}]'.format(index), '?']) for index in indices for a in attributes]
+            values = [re.sub(r'^\[\d+\]\s*', '', v) for v in self.api.send_multi_commands_return(obj_commands)]
+            packets_values.extend(values[i:i + len(attributes)] for i in range(0, len(values), len(attributes)))
+        return packets_values
+
+    def _save_file(self, file_name, cap_type, from_index, to_index, window=1000):
+        """ Stream packets into binary file, window packets at a time, with pc_extra timestamps if available. """
+
+        attributes = ['pc_packet', 'pc_extra']
+        writer_class = {XenaCaptureBufferType.pcap: XenaPcapWriter,
+                        XenaCaptureBufferType.pcapng: XenaPcapngWriter,
+                        XenaCaptureBufferType.store: XenaCaptureStoreWriter}[cap_type]
+        with writer_class(file_name) as writer:
+            for start in range(from_index, to_index, window):
+                end = min(start + window, to_index)
+                try:
+                    packets_values = self._read_packets_attributes(attributes, start, end, window)
+                except XenaCommandError as _:
+                    self.logger.warning('Failed to read pc_extra, timestamps will not be saved')
+                    attributes = ['pc_packet']
+                    packets_values = self._read_packets_attributes(attributes, start, end, window)
+                for values in packets_values:
+                    packet = binascii.unhexlify(values[0].split('0x')[1])
+                    timestamp, length = 0, None
+                    if len(values) > 1:
+                        extra = values[1].split()
+                        timestamp, length = int(extra[0]), int(extra[-1])
+                    writer.write(packet, timestamp, length)
+
     def _save_captue(self, file_name, packets):
         if file_name:
             with open(file_name, 'w+') as f:
@@ -492,6 +792,98 @@ class XenaCapture(XenaObject):
                     f.write(packet)
 
 
+class XenaCaptureTail(threading.Thread):
+    """ Background thread that polls pc_stats while capture is running and downloads new packets.
+
+    New packets are delivered, in index order, to subscribed callbacks and to the queue, as (index, packet) where packet
+    is in read_packets format. When the tail thread exits it puts None in the queue.
+    """
+
+    def __init__(self, capture, interval=1, window=1000, extra=False, from_index=0):
+        """
+        :param capture: capture to tail.
+        :type capture: xenavalkyrie.xena_port.XenaCapture
+        :param interval: pc_stats polling interval in seconds.
+        :param window: maximum number of packets to query in single write.
+        :param extra: True - read pc_extra for each packet.
+        :param from_index: index of first packet to deliver.
+        """
+
+        threading.Thread.__init__(self)
+        self.capture = capture
+        self.logger = capture.logger
+        self.interval = interval
+        self.window = window
+        self.extra = extra
+        self.next_index = from_index
+        self.queue = Queue()
+        self.callbacks = []
+        self.num_errors = 0
+        self.finished = threading.Event()
+        self.daemon = True
+
+    def stop(self):
+        """ Stop tailing, wait for the tail thread to exit and remove the tail from the session capture tails.
+
+        Packets captured until stop are delivered. If called from subscribed callback (on the tail thread) the tail
+        thread exits after the current poll.
+        """
+
+        self.finished.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+        if self in self.capture.session.capture_tails:
+            self.capture.session.capture_tails.remove(self)
+
+    def subscribe(self, callback):
+        """ Register callback to be called, on the tail thread, for each new packet.
+
+        :param callback: function(index, packet).
+        """
+
+        self.callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        """ Remove callback previously registered with subscribe. """
+
+        self.callbacks.remove(callback)
+
+    def poll(self):
+        """ Download and deliver all packets captured since the last poll.
+
+        :return: number of new packets.
+        """
+
+        num_packets = self.capture.read_stats()['packets']
+        if num_packets < self.next_index:
+            self.logger.info('Capture restarted, tail from first packet')
+            self.next_index = 0
+        from_index = self.next_index
+        for start in range(from_index, num_packets, self.window):
+            end = min(start + self.window, num_packets)
+            for index, packet in enumerate(self.capture.read_packets(start, end, self.window, self.extra), start):
+                self.queue.put((index, packet))
+                for callback in list(self.callbacks):
+                    try:
+                        callback(index, packet)
+                    except Exception as e:
+                        self.logger.warning('Capture tail callback {} failed - {}'.format(callback, e))
+            self.next_index = end
+        return num_packets - from_index
+
+    def run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                self.num_errors += 1
+                self.logger.warning('Capture tail failed to read packets - {}'.format(e))
+            if self.finished.is_set():
+                break
+            self.finished.wait(self.interval)
+        self.queue.put(None)
+
+
 class XenaCapturePacket(XenaObject21):
     """ Represents single captured packet. """
 
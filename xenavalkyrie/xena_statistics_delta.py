@@ -0,0 +1,143 @@
+"""
+Classes and utilities to calculate deltas, rates and loss over statistics views snapshots.
+
+The chassis reports cumulative counters (bytes, packets, errors...) and its own instantaneous rates (bps, pps...).
+The delta engine keeps the previous snapshot of a statistics view as flat list of values with fixed layout and
+calculates deltas and rates over all objects and counters in a single pass.
+
+:author: yoram@ignissoft.com
+"""
+
+import time
+from collections import OrderedDict
+
+from xenavalkyrie.xena_statistics_view import XenaStreamsStats
+
+
+class XenaStatsDelta(object):
+    """ Incremental deltas and rates calculator over statistics view snapshots.
+
+    Gauge counters (rates, latency, jitter) are not accumulated by the chassis so their delta is meaningless, the
+    engine returns their current value instead. Cumulative counters that decrease between two snapshots were cleared
+    (pt_clear/pr_clear) so their delta is the current value (counted since the clear).
+    """
+
+    gauge_stats = ('bps', 'pps', 'min', 'avg', 'max', 'avg1sec', 'min1sec', 'max1sec')
+
+    def __init__(self, view):
+        """
+        :param view: statistics view to calculate deltas for.
+        :type view: xenavalkyrie.xena_statistics_view.XenaStats
+        """
+
+        self.view = view
+        self.objects = []
+        self.counters = []
+        self.gauges = []
+        self.values = None
+        self.previous = None
+        self.timestamp = None
+        self.previous_timestamp = None
+
+    def reset(self):
+        """ Forget previous snapshot, the next update will set new baseline. """
+
+        self.values = None
+        self.previous = None
+        self.timestamp = None
+        self.previous_timestamp = None
+
+    def update(self, read=True):
+        """ Take new snapshot.
+
+        :param read: True - read statistics from chassis, False - use the view current statistics (for example, when
+            the view is polled by XenaStatsPoller).
+        :return: dictionary {object name: {counter name: delta}} since the previous snapshot, None for the first
+            snapshot.
+        """
+
+        if read:
+            self.view.read_stats()
+        flat_stats = self._flat_stats()
+        counters = list(next(iter(flat_stats.values())).keys()) if flat_stats else []
+        if list(flat_stats.keys()) != self.objects or counters != self.counters:
+            self.reset()
+            self.objects = list(flat_stats.keys())
+            self.counters = counters
+            self.gauges = [c.split('_')[-1] in self.gauge_stats for c in self.counters]
+        self.previous = self.values
+        self.previous_timestamp = self.timestamp
+        self.values = [flat_stats[o][c] for o in self.objects for c in self.counters]
+        self.timestamp = self.view.timestamp if self.view.timestamp else time.time()
+        return self.deltas()
+
+    def deltas(self):
+        """
+        :return: dictionary {object name: {counter name: delta}} between the last two snapshots, None if there is
+            no previous snapshot.
+        """
+
+        if self.previous is None:
+            return None
+        return self._table(self._deltas())
+
+    def rates(self):
+        """
+        :return: dictionary {object name: {counter name: delta per second}} between the last two snapshots.
+            Gauges are returned as is. None if there is no previous snapshot or the snapshots have the same timestamp.
+        """
+
+        if self.previous is None:
+            return None
+        interval = self.timestamp - self.previous_timestamp
+        if interval <= 0:
+            return None
+        rates = [d if g else d / float(interval) for d, g in zip(self._deltas(), self.gauges * len(self.objects))]
+        return self._table(rates)
+
+    def loss(self):
+        """ Streams loss between the last two snapshots, streams view only.
+
+        :return: dictionary {stream name: {tx: TX packets, rx: RX packets, loss: lost packets, ratio: loss ratio}},
+            None if there is no previous snapshot.
+        """
+
+        if not isinstance(self.view, XenaStreamsStats):
+            raise TypeError('loss is supported for streams view only, not {}'.format(type(self.view)))
+        deltas = self.deltas()
+        if deltas is None:
+            return None
+        loss = OrderedDict()
+        for name, stream_deltas in deltas.items():
+            tx = stream_deltas['tx_packets']
+            rx = stream_deltas['rx_packets']
+            loss[name] = OrderedDict([('tx', tx), ('rx', rx), ('loss', tx - rx),
+                                      ('ratio', (tx - rx) / float(tx) if tx else 0.0)])
+        return loss
+
+    #
+    # Private methods.
+    #
+
+    def _flat_stats(self):
+        if not isinstance(self.view, XenaStreamsStats):
+            return self.view.get_flat_stats()
+        flat_stats = OrderedDict()
+        for stream, stream_stats in self.view.statistics.items():
+            flat_stream_stats = OrderedDict(('tx_' + k, v) for k, v in stream_stats['tx'].items())
+            rx_traffic = [rx_stats['pr_tpldtraffic'] for rx_stats in stream_stats['rx'].values()]
+            flat_stream_stats['rx_bytes'] = sum(t['byt'] for t in rx_traffic)
+            flat_stream_stats['rx_packets'] = sum(t['pac'] for t in rx_traffic)
+            flat_stats[stream.name] = flat_stream_stats
+        return flat_stats
+
+    def _deltas(self):
+        gauges = self.gauges * len(self.objects)
+        return [c if g or c < p else c - p for c, p, g in zip(self.values, self.previous, gauges)]
+
+    def _table(self, values):
+        table = OrderedDict()
+        num_counters = len(self.counters)
+        for i, obj in enumerate(self.objects):
+            table[obj] = OrderedDict(zip(self.counters, values[i * num_counters:(i + 1) * num_counters]))
+        return table
@@ -0,0 +1,99 @@
+"""
+Classes and utilities to stream statistics views into files.
+
+Writers are attached to statistics view and append one row per object each time the view reads statistics, so long
+runs can record every sample with bounded memory.
+
+:author: yoram@ignissoft.com
+"""
+
+import io
+import gzip
+import json
+from collections import OrderedDict
+
+
+class XenaStatsWriter(object):
+    """ Base class for all statistics writers. """
+
+    def __init__(self, view, file_name, counters=None, compress=False, buffer_size=64 * 1024):
+        """ Create writer, write header and attach to the statistics view.
+
+        :param view: statistics view to export.
+        :type view: xenavalkyrie.xena_statistics_view.XenaStats
+        :param file_name: output file name, existing file is overwritten.
+        :param counters: list of counters to write, as returned by view.get_flat_captions(). Default - all counters.
+        :param compress: True - write gzip compressed file, False - write plain file.
+        :param buffer_size: write buffer size in bytes.
+        """
+
+        self.view = view
+        self.file_name = file_name
+        self.counters = counters if counters else view.get_flat_captions()
+        unknown_counters = set(self.counters) - set(view.get_flat_captions())
+        if unknown_counters:
+            raise ValueError('Unknown counters {}'.format(sorted(unknown_counters)))
+        if compress:
+            self.file = io.BufferedWriter(gzip.GzipFile(file_name, 'wb'), buffer_size)
+        else:
+            self.file = io.open(file_name, 'wb', buffering=buffer_size)
+        self._write_header()
+        self.view.writers.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self):
+        """ Write view current statistics - single row per object. """
+
+        for name, obj_stats in self.view.get_flat_stats().items():
+            self._write_row(self.view.timestamp, name, [obj_stats[c] for c in self.counters])
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        """ Detach from statistics view and close the file. """
+
+        if self in self.view.writers:
+            self.view.writers.remove(self)
+        self.file.close()
+
+    #
+    # Private methods.
+    #
+
+    def _write_header(self):
+        pass
+
+    def _write_row(self, timestamp, name, values):
+        raise NotImplementedError()
+
+
+class XenaStatsCsvWriter(XenaStatsWriter):
+    """ Write statistics as CSV - timestamp, object name and one column per counter. """
+
+    def _write_header(self):
+        self.file.write(','.join(['timestamp', 'name'] + [self._quote(c) for c in self.counters]).encode('utf-8'))
+        self.file.write(b'\n')
+
+    def _write_row(self, timestamp, name, values):
+        row = '{},{},{}\n'.format(timestamp, self._quote(name), ','.join([str(v) for v in values]))
+        self.file.write(row.encode('utf-8'))
+
+    def _quote(self, value):
+        if ',' in value or '"' in value or '\n' in value:
+            return '"{}"'.format(value.replace('"', '""'))
+        return value
+
+
+class XenaStatsJsonWriter(XenaStatsWriter):
+    """ Write statistics as JSON lines - single JSON object per object per sample. """
+
+    def _write_row(self, timestamp, name, values):
+        row = OrderedDict([('timestamp', timestamp), ('name', name)] + list(zip(self.counters, values)))
+        self.file.write(json.dumps(row).encode('utf-8'))
+        self.file.write(b'\n')
@@ -0,0 +1,124 @@
+"""
+Classes and utilities to expose live Xena statistics over local HTTP endpoint.
+
+The server exposes the latest ports, streams and TPLDs counters, plus poller instrumentation, in Prometheus text
+exposition format. Counters are sampled by XenaStatsPoller and rendered once per sample, so scrapes never trigger
+chassis queries.
+
+:author: yoram@ignissoft.com
+"""
+
+import re
+import threading
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+from xenavalkyrie.xena_statistics_view import XenaPortsStats, XenaStreamsStats
+from xenavalkyrie.xena_statistics_delta import XenaStatsDelta
+
+
+class XenaStatsHttpServer(object):
+    """ Local HTTP server that serves cached statistics snapshot on /metrics. """
+
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, session, port, address='localhost', interval=1):
+        """
+        :param session: current session.
+        :type session: xenavalkyrie.xena_app.XenaSession
+        :param port: TCP port to listen on, 0 - any free port (see self.port). There is no default port to avoid
+            clashes with other exporters on monitoring hosts.
+        :param address: address to listen on.
+        :param interval: statistics polling interval in seconds.
+        """
+
+        self.session = session
+        self.logger = session.logger
+        self.interval = interval
+        #: TPLDs statistics are taken from the streams view, which reads all TPLDs to join RX statistics to streams.
+        self.views = [XenaPortsStats(session), XenaStreamsStats(session)]
+        self.metrics = b''
+        self.poller = None
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                metrics = server.metrics
+                self.send_response(200)
+                self.send_header('Content-Type', server.content_type)
+                self.send_header('Content-Length', str(len(metrics)))
+                self.end_headers()
+                self.wfile.write(metrics)
+
+            def log_message(self, format, *args):
+                server.logger.debug('Metrics server - ' + format % args)
+
+        self.http_server = HTTPServer((address, port), Handler)
+        self.port = self.http_server.server_address[1]
+        self.thread = threading.Thread(target=self.http_server.serve_forever)
+        self.thread.daemon = True
+
+    def start(self):
+        """ Start statistics poller and HTTP server. """
+
+        self.poller = self.session.start_stats_poller(self.views, self.interval, size=1)
+        self.poller.subscribe(self._render)
+        self.thread.start()
+        self.logger.info('Metrics server listening on {}:{}'.format(*self.http_server.server_address))
+
+    def stop(self):
+        """ Stop HTTP server and statistics poller. """
+
+        if self.poller:
+            self.poller.stop()
+        if self.thread.is_alive():
+            self.http_server.shutdown()
+        self.http_server.server_close()
+
+    #
+    # Private methods.
+    #
+
+    def _render(self, timestamp, sample):
+        lines = []
+        ports_stats, streams_stats = self.views
+        for port, port_stats in sample[ports_stats].items():
+            self._add_group_stats(lines, 'port', {'port': port.name}, port_stats)
+        for stream, stream_stats in sample[streams_stats].items():
+            labels = {'port': stream.parent.name, 'stream': stream.name}
+            self._add_group_stats(lines, 'stream', labels, {'tx': stream_stats['tx']})
+        for tpld, tpld_stats in streams_stats.tpld_statistics.items():
+            self._add_group_stats(lines, 'tpld', {'port': tpld.parent.name, 'tpld': str(tpld.id)}, tpld_stats)
+
+        lines.append(('xena_poller_samples_total', 'counter', '', self.poller.num_samples))
+        lines.append(('xena_poller_errors_total', 'counter', '', self.poller.num_errors))
+        lines.append(('xena_poller_last_duration_seconds', 'gauge', '', self.poller.last_duration))
+        lines.append(('xena_poller_last_sample_timestamp_seconds', 'gauge', '', timestamp))
+
+        metrics = []
+        last_name = None
+        for name, metric_type, labels, value in sorted(lines, key=lambda l: l[0]):
+            if name != last_name:
+                metrics.append('# TYPE {} {}'.format(name, metric_type))
+                last_name = name
+            metrics.append('{}{} {}'.format(name, labels, value))
+        self.metrics = ('\n'.join(metrics) + '\n').encode('utf-8')
+
+    def _add_group_stats(self, lines, obj_type, labels, group_stats):
+        labels_str = '{' + ','.join('{}="{}"'.format(k, self._escape(v)) for k, v in sorted(labels.items())) + '}'
+        for group_name, stats in group_stats.items():
+            for stat_name, value in stats.items():
+                name = 'xena_{}_{}_{}'.format(obj_type, group_name, re.sub('[^a-zA-Z0-9_]', '_', stat_name).lower())
+                metric_type = 'gauge' if stat_name in XenaStatsDelta.gauge_stats else 'counter'
+                lines.append((name, metric_type, labels_str, value))
+
+    def _escape(self, value):
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
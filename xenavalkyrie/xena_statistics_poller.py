@@ -0,0 +1,178 @@
+"""
+Classes and utilities to poll Xena statistics views in the background.
+
+The poller samples statistics views at fixed cadence on a background thread and stores timestamped samples in a
+bounded ring buffer, so tests can watch statistics live without blocking on chassis I/O.
+
+:author: yoram@ignissoft.com
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class XenaStatsRingBuffer(object):
+    """ Bounded, preallocated, thread safe buffer of timestamped samples. """
+
+    def __init__(self, size):
+        """
+        :param size: maximum number of samples to keep, older samples are overwritten.
+        """
+
+        self.size = size
+        self.timestamps = [None] * size
+        self.samples = [None] * size
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def append(self, timestamp, sample):
+        """ Add sample, overwrite oldest sample if buffer is full.
+
+        :param timestamp: sample host time.
+        :param sample: sample data.
+        """
+
+        with self.lock:
+            self.timestamps[self.count % self.size] = timestamp
+            self.samples[self.count % self.size] = sample
+            self.count += 1
+
+    def latest(self):
+        """
+        :return: (timestamp, sample) of the latest sample, (None, None) if buffer is empty.
+        """
+
+        with self.lock:
+            if not self.count:
+                return None, None
+            last = (self.count - 1) % self.size
+            return self.timestamps[last], self.samples[last]
+
+    def last(self, num_samples):
+        """
+        :param num_samples: number of requested samples.
+        :return: list of (timestamp, sample) of the last num_samples samples, oldest first.
+        """
+
+        with self.lock:
+            num_samples = min(num_samples, self.count, self.size)
+            indices = [i % self.size for i in range(self.count - num_samples, self.count)]
+            return [(self.timestamps[i], self.samples[i]) for i in indices]
+
+    def window(self, start_time, end_time=None):
+        """
+        :param start_time: window start time (inclusive).
+        :param end_time: window end time (inclusive). If None - up to the latest sample.
+        :return: list of (timestamp, sample) of all samples inside the window, oldest first.
+        """
+
+        return [(t, s) for t, s in self.last(self.size) if t >= start_time and (end_time is None or t <= end_time)]
+
+
+class XenaStatsPoller(threading.Thread):
+    """ Background thread that samples statistics views at fixed cadence.
+
+    Each sample is a dictionary {view: statistics} of all polled views. The poller schedules samples on absolute time
+    ticks so read duration does not accumulate into drift, ticks missed due to slow reads are skipped.
+    """
+
+    def __init__(self, session, views, interval=1, size=3600):
+        """
+        :param session: current session.
+        :type session: xenavalkyrie.xena_app.XenaSession
+        :param views: list of statistics views to poll.
+        :type views: list of xenavalkyrie.xena_statistics_view.XenaStats
+        :param interval: polling interval in seconds.
+        :param size: number of samples to keep in the ring buffer.
+        """
+
+        threading.Thread.__init__(self)
+        self.session = session
+        self.logger = session.logger
+        self.views = views
+        self.interval = interval
+        self.buffer = XenaStatsRingBuffer(size)
+        self.callbacks = []
+        self.num_samples = 0
+        self.num_errors = 0
+        self.last_duration = None
+        self.finished = threading.Event()
+        self.daemon = True
+
+    def stop(self):
+        """ Stop polling, wait for the polling thread to exit and remove the poller from the session pollers.
+
+        If called from subscribed callback (on the polling thread) the polling thread exits after the current sample.
+        """
+
+        self.finished.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+        if self in self.session.stats_pollers:
+            self.session.stats_pollers.remove(self)
+
+    def subscribe(self, callback):
+        """ Register callback to be called, on the polling thread, after each sample.
+
+        :param callback: function(timestamp, sample).
+        """
+
+        self.callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        """ Remove callback previously registered with subscribe. """
+
+        self.callbacks.remove(callback)
+
+    def latest(self):
+        """
+        :return: (timestamp, sample) of the latest sample.
+        """
+
+        return self.buffer.latest()
+
+    def window(self, seconds):
+        """
+        :param seconds: window length in seconds.
+        :return: list of (timestamp, sample) of all samples taken in the last seconds.
+        """
+
+        return self.buffer.window(time.time() - seconds)
+
+    def poll(self):
+        """ Take single sample of all views and store it in the buffer.
+
+        :return: (timestamp, sample) of the new sample.
+        """
+
+        sample = OrderedDict()
+        timestamp = time.time()
+        for view in self.views:
+            sample[view] = view.read_stats()
+        self.last_duration = time.time() - timestamp
+        self.num_samples += 1
+        self.buffer.append(timestamp, sample)
+        for callback in list(self.callbacks):
+            try:
+                callback(timestamp, sample)
+            except Exception as e:
+                self.logger.warning('Statistics poller callback {} failed - {}'.format(callback, e))
+        return timestamp, sample
+
+    def run(self):
+        next_tick = time.time()
+        while not self.finished.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                self.num_errors += 1
+                self.logger.warning('Statistics poller failed to read statistics - {}'.format(e))
+            next_tick += self.interval
+            now = time.time()
+            if next_tick < now:
+                next_tick += ((now - next_tick) // self.interval + 1) * self.interval
+            self.finished.wait(next_tick - now)
@@ -0,0 +1,230 @@
+"""
+Classes and utilities to publish statistics views in shared memory for other processes on the host.
+
+The publisher writes statistics snapshots into memory mapped file with fixed layout, derived from the view captions:
+
++---------+----------+-----------+----------+----------+------------+------+---------------------------------+
+| magic   | sequence | timestamp | num rows | num cols | names size | pad  | names (JSON) | values (int64)   |
++---------+----------+-----------+----------+----------+------------+------+---------------------------------+
+
+Values table is rows (objects) x columns (counters). The sequence number is a seqlock - it is odd while the publisher
+writes new snapshot, so readers retry until they read the same even sequence before and after reading the values.
+
+:author: yoram@ignissoft.com
+"""
+
+import json
+import mmap
+import struct
+import time
+from collections import OrderedDict
+
+from trafficgenerator.tgn_utils import TgnError
+
+_header = struct.Struct('<8sQdIII4x')
+_magic = b'XENASTAT'
+_sequence_offset = 8
+_value = struct.Struct('<q')
+_value_size = _value.size
+
+
+class XenaStatsPublisher(object):
+    """ Publish statistics view snapshots into shared memory table.
+
+    The publisher is attached to the view so every read_stats (by the test or by XenaStatsPoller) publishes new
+    snapshot.
+    """
+
+    def __init__(self, view, file_name, objects=None):
+        """ Create the shared memory file and attach to the statistics view.
+
+        :param view: statistics view to publish.
+        :type view: xenavalkyrie.xena_statistics_view.XenaStats
+        :param file_name: shared memory file name (for example, under /dev/shm).
+        :param objects: list of objects names (table rows). Default - all objects currently in the view (statistics
+            are read if the view was never read).
+        """
+
+        self.view = view
+        self.file_name = file_name
+        if not objects:
+            if view.statistics is None:
+                view.read_stats()
+            objects = list(view.get_flat_stats().keys())
+        self.objects = objects
+        self.counters = view.get_flat_captions()
+        self.rows = dict((name, row) for row, name in enumerate(self.objects))
+
+        names = json.dumps({'objects': self.objects, 'counters': self.counters}).encode('utf-8')
+        names += b' ' * (-len(names) % _value_size)
+        self.values_offset = _header.size + len(names)
+        size = self.values_offset + len(self.objects) * len(self.counters) * _value_size
+
+        with open(file_name, 'wb') as f:
+            f.write(_header.pack(_magic, 0, 0.0, len(self.objects), len(self.counters), len(names)))
+            f.write(names)
+            f.write(b'\x00' * (size - self.values_offset))
+        self.file = open(file_name, 'r+b')
+        self.mm = mmap.mmap(self.file.fileno(), size)
+        self.values = _Values(self.mm, self.values_offset, len(self.objects) * len(self.counters))
+        self.sequence = 0
+        self.view.writers.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self):
+        """ Publish the view current statistics. """
+
+        num_counters = len(self.counters)
+        flat_stats = self.view.get_flat_stats()
+        self._set_sequence(self.sequence + 1)
+        for name, obj_stats in flat_stats.items():
+            row = self.rows.get(name)
+            if row is not None:
+                offset = row * num_counters
+                for column, counter in enumerate(self.counters):
+                    self.values[offset + column] = obj_stats.get(counter, 0)
+        struct.pack_into('<d', self.mm, _sequence_offset + 8, self.view.timestamp or time.time())
+        self._set_sequence(self.sequence + 1)
+
+    def close(self):
+        """ Detach from statistics view and close the shared memory (the file is not deleted). """
+
+        if self in self.view.writers:
+            self.view.writers.remove(self)
+        self.mm.close()
+        self.file.close()
+
+    #
+    # Private methods.
+    #
+
+    def _set_sequence(self, sequence):
+        self.sequence = sequence
+        struct.pack_into('<Q', self.mm, _sequence_offset, sequence)
+
+
+class XenaStatsReader(object):
+    """ Read statistics published by XenaStatsPublisher, from any process on the host, with no chassis traffic. """
+
+    def __init__(self, file_name):
+        """
+        :param file_name: shared memory file name, as created by the publisher.
+        """
+
+        self.file = open(file_name, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, _, _, num_rows, num_cols, names_size = _header.unpack_from(self.mm, 0)
+        if magic != _magic:
+            raise ValueError('{} is not Xena statistics shared memory file'.format(file_name))
+        names = json.loads(self.mm[_header.size:_header.size + names_size].decode('utf-8'))
+        self.objects = names['objects']
+        self.counters = names['counters']
+        self.rows = dict((name, row) for row, name in enumerate(self.objects))
+        self.columns = dict((name, column) for column, name in enumerate(self.counters))
+        self.values = _Values(self.mm, _header.size + names_size, num_rows * num_cols)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def read(self, func=None, timeout=1):
+        """ Read consistent snapshot.
+
+        :param func: function(timestamp, values) to run on the snapshot, where values is zero copy sequence of the
+            flat table (row * len(counters) + column), read directly from the shared memory. func may be called more
+            than once if the publisher writes while func runs, so it must not have side effects. Default - return the
+            snapshot as dictionary.
+        :param timeout: seconds to wait for consistent snapshot.
+        :return: func return value. Default - (timestamp, {object name: {counter name: value}}).
+        """
+
+        func = func if func else self._to_table
+        deadline = time.time() + timeout
+        while True:
+            sequence = self._sequence()
+            if sequence % 2:
+                if time.time() > deadline:
+                    raise TgnError('No consistent snapshot in {} after {} seconds, publisher died while writing?'.
+                                   format(self.file.name, timeout))
+                time.sleep(0.001)
+                continue
+            timestamp = struct.unpack_from('<d', self.mm, _sequence_offset + 8)[0]
+            result = func(timestamp, self.values)
+            if self._sequence() == sequence:
+                return result
+            if time.time() > deadline:
+                raise TgnError('No consistent snapshot in {} after {} seconds'.format(self.file.name, timeout))
+
+    def get(self, obj, counter):
+        """
+        :param obj: object name.
+        :param counter: counter name.
+        :return: (timestamp, value) of single counter.
+        """
+
+        index = self.rows[obj] * len(self.counters) + self.columns[counter]
+        return self.read(lambda timestamp, values: (timestamp, values[index]))
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+    #
+    # Private methods.
+    #
+
+    def _sequence(self):
+        return struct.unpack_from('<Q', self.mm, _sequence_offset)[0]
+
+    def _to_table(self, timestamp, values):
+        num_counters = len(self.counters)
+        flat_values = values.tolist()
+        table = OrderedDict()
+        for row, obj in enumerate(self.objects):
+            table[obj] = OrderedDict(zip(self.counters, flat_values[row * num_counters:(row + 1) * num_counters]))
+        return timestamp, table
+
+
+class _Values(object):
+    """ Zero copy int64 table inside shared memory buffer (portable replacement for memoryview.cast('q')). """
+
+    def __init__(self, buf, offset, size):
+        """
+        :param buf: shared memory buffer.
+        :param offset: table offset in the buffer.
+        :param size: number of values in the table.
+        """
+
+        self.buf = buf
+        self.offset = offset
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        return _value.unpack_from(self.buf, self._offset(index))[0]
+
+    def __setitem__(self, index, value):
+        _value.pack_into(self.buf, self._offset(index), value)
+
+    def tolist(self):
+        return list(struct.unpack_from('<{}q'.format(self.size), self.buf, self.offset))
+
+    #
+    # Private methods.
+    #
+
+    def _offset(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError('Value index {} out of table size {}'.format(index, self.size))
+        return self.offset + index * _value_size
@@ -7,23 +7,37 @@ There are three different views - ports, streams and TPLD.
 :author: yoram@ignissoft.com
 """
 
+import time
 from collections import OrderedDict
 
 from trafficgenerator.tgn_object import TgnSubStatsDict
 from xenavalkyrie.xena_object import XenaObjectsDict
+from xenavalkyrie.xena_port import XenaBasePort, XenaTpld
+from xenavalkyrie.xena_stream import XenaStream
 
 
 class XenaStats(object):
     """ Base class for all statistics views. """
 
-    def __init__(self, session):
+    def __init__(self, session, counters=None):
         """
         :param session: current session
         :type session: xenavalkyrie.xena_app.XenaSession
+        :param counters: list of counters to read - group names or full counter names as returned by get_flat_stats
+            (group name_stat name). Default - all counters.
         """
 
         self.session = session
+        self.counters = counters
         self.statistics = None
+        self.timestamp = None
+        self.writers = []
+
+    def get_flat_captions(self):
+        """
+        :return: list of all counters names as returned by get_flat_stats.
+        """
+        raise NotImplementedError()
 
     def get_flat_stats(self):
         """
@@ -39,6 +53,41 @@ class XenaStats(object):
             flat_stats[obj.name] = flat_obj_stats
         return flat_stats
 
+    #
+    # Private methods.
+    #
+
+    def _write_stats(self):
+        for writer in self.writers:
+            writer.write()
+
+    def _get_flat_captions(self, stats_captions):
+        return [group_name + '_' + stat_name for group_name, captions in stats_captions.items() for stat_name in
+                captions]
+
+    def _select_captions(self, stats_captions):
+        """ Build the subset of stats_captions selected by self.counters, ordered as stats_captions. """
+
+        if not self.counters:
+            return OrderedDict(stats_captions)
+        selected = set()
+        for counter in self.counters:
+            if counter in stats_captions:
+                selected.update((counter, stat_name) for stat_name in stats_captions[counter])
+                continue
+            for group_name, captions in stats_captions.items():
+                if counter.startswith(group_name + '_') and counter[len(group_name) + 1:] in captions:
+                    selected.add((group_name, counter[len(group_name) + 1:]))
+                    break
+            else:
+                raise ValueError('Unknown counter {}'.format(counter))
+        selected_captions = OrderedDict()
+        for group_name, captions in stats_captions.items():
+            group_captions = [stat_name for stat_name in captions if (group_name, stat_name) in selected]
+            if group_captions:
+                selected_captions[group_name] = group_captions
+        return selected_captions
+
 
 class XenaPortsStats(XenaStats):
     """ Ports statistics view.
@@ -59,14 +108,22 @@ class XenaPortsStats(XenaStats):
     def read_stats(self):
         """ Read current ports statistics from chassis.
 
+        All ports on the same chassis are read in a single write/read cycle, timestamp is the host time of the read.
+
         :return: dictionary {port name {group name, {stat name: stat value}}}
         """
 
+        self.timestamp = time.time()
         self.statistics = XenaObjectsDict()
-        for port in self.session.ports.values():
-            self.statistics[port] = port.read_port_stats()
+        captions = self._select_captions(XenaBasePort.stats_captions)
+        for chassis, ports in self.session._per_chassis_ports(*self.session.ports.values()).items():
+            self.statistics.update(chassis.read_ports_stats(*ports, captions=captions))
+        self._write_stats()
         return self.statistics
 
+    def get_flat_captions(self):
+        return self._get_flat_captions(self._select_captions(XenaBasePort.stats_captions))
+
 
 class XenaStreamsStats(XenaStats):
     """ Streams statistics view.
@@ -88,34 +145,76 @@ class XenaStreamsStats(XenaStats):
     +--------+-------+-----+-------+-----+-------+-----+-------+-----+-------+-----+
     """
 
+    def __init__(self, session, counters=None):
+        """
+        :param session: current session
+        :type session: xenavalkyrie.xena_app.XenaSession
+        :param counters: list of TX counters to read. Default - all counters.
+        """
+
+        super(XenaStreamsStats, self).__init__(session, counters)
+        self.tx_statistics = None
+        #: RX statistics of all TPLDs, as read by XenaTpldsStats, from the last read_stats.
+        self.tpld_statistics = None
+        self.tpld_streams = {}
+        self._streams_tplds = None
+
     def read_stats(self):
         """ Read current statistics from chassis.
 
+        TX statistics of all streams are read in a single write/read cycle per chassis and RX statistics are joined to
+        streams using cached TPLD ID to streams mapping that is rebuilt only when streams change.
+
         :return: dictionary {stream: {tx: {stat name: stat value}} rx: {tpld: {stat group {stat name: value}}}}
         """
 
+        self.timestamp = time.time()
+        streams = [stream for port in self.session.ports.values() for stream in port.streams.values()]
+        self._update_tpld_streams(streams)
+
+        tx_captions = self.get_flat_captions()
+        tx_indices = [XenaStream.stats_captions.index(c) for c in tx_captions]
+        tx_values = self.session.api.get_multi_stats([(stream, 'pt_stream') for stream in streams])
         self.tx_statistics = XenaObjectsDict()
-        for port in self.session.ports.values():
-            for stream in port.streams.values():
-                self.tx_statistics[stream] = stream.read_stats()
+        for stream, values in zip(streams, tx_values):
+            self.tx_statistics[stream] = dict(zip(tx_captions, [values[i] for i in tx_indices]))
 
-        tpld_statistics = XenaTpldsStats(self.session).read_stats()
+        self.tpld_statistics = XenaTpldsStats(self.session).read_stats()
 
         self.statistics = XenaObjectsDict()
         for stream, stream_stats in self.tx_statistics.items():
             self.statistics[stream] = OrderedDict()
             self.statistics[stream]['tx'] = stream_stats
             self.statistics[stream]['rx'] = TgnSubStatsDict()
-            ps_tpldid = stream.get_attribute('ps_tpldid')
-            stream_tpld = int(ps_tpldid) if ps_tpldid else -1
-            for tpld, tpld_stats in tpld_statistics.items():
-                if tpld.id == stream_tpld:
-                    self.statistics[stream]['rx'][tpld.parent] = tpld_stats
+        for tpld, tpld_stats in self.tpld_statistics.items():
+            for stream in self.tpld_streams.get(tpld.id, []):
+                self.statistics[stream]['rx'][tpld.parent] = tpld_stats
+        self._write_stats()
         return self.statistics
 
+    def get_flat_captions(self):
+        if not self.counters:
+            return list(XenaStream.stats_captions)
+        unknown_counters = set(self.counters) - set(XenaStream.stats_captions)
+        if unknown_counters:
+            raise ValueError('Unknown counters {}'.format(sorted(unknown_counters)))
+        return [c for c in XenaStream.stats_captions if c in self.counters]
+
     def get_flat_stats(self):
         return OrderedDict({str(k): v for k, v in self.tx_statistics.items()})
 
+    #
+    # Private methods.
+    #
+
+    def _update_tpld_streams(self, streams):
+        streams_tplds = [(stream, stream.tpld_id) for stream in streams]
+        if streams_tplds != self._streams_tplds:
+            self._streams_tplds = streams_tplds
+            self.tpld_streams = {}
+            for stream, tpld_id in streams_tplds:
+                self.tpld_streams.setdefault(tpld_id, []).append(stream)
+
 
 class XenaTpldsStats(XenaStats):
     """ TPLDs statistics view.
@@ -139,8 +238,18 @@ class XenaTpldsStats(XenaStats):
         :return: dictionary {tpld full index {group name {stat name: stat value}}}
         """
 
+        self.timestamp = time.time()
+        captions = self._select_captions(XenaTpld.stats_captions)
+        tplds = [tpld for port in self.session.ports.values() for tpld in port.tplds.values()]
+        obj_stat_names = [(tpld, stat_name) for tpld in tplds for stat_name in captions]
+        values = self.session.api.get_multi_stats(obj_stat_names)
+        num_groups = len(captions)
+
         self.statistics = XenaObjectsDict()
-        for port in self.session.ports.values():
-            for tpld in port.tplds.values():
-                self.statistics[tpld] = tpld.read_stats()
+        for i, tpld in enumerate(tplds):
+            self.statistics[tpld] = tpld.stats_with_captions(values[i * num_groups:(i + 1) * num_groups], captions)
+        self._write_stats()
         return self.statistics
+
+    def get_flat_captions(self):
+        return self._get_flat_captions(self._select_captions(XenaTpld.stats_captions))
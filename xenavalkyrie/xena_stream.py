@@ -5,15 +5,22 @@ Classes and utilities that represents Xena XenaManager-2G stream.
 """
 
 import re
+import socket
+import struct
 import binascii
+import threading
 from enum import Enum
 from collections import OrderedDict
 from copy import deepcopy
 
 from pypacker.layer12.ethernet import Ethernet
 
+from trafficgenerator.tgn_utils import TgnError
+
 from xenavalkyrie.xena_object import XenaObject, XenaObject21
 from xenavalkyrie.api.xena_cli import XenaCliWrapper
+from xenavalkyrie.xena_pcap_analyzer import packet_layout
+from xenavalkyrie.xena_stream_preview import modifiers_sequence
 
 
 class XenaStreamState(Enum):
@@ -39,7 +46,11 @@ class XenaStream(XenaObject21):
     _info_config_commands = ['ps_config']
     stats_captions = ['bps', 'pps', 'bytes', 'packets']
 
-    next_tpld_id = 0
+    #: Encoded packet headers LRU cache {(header bytes, l4_checksum): (ps_headerprotocol, ps_packetheader)}, so streams
+    #: with the same headers are encoded once. Shared by all streams, on any thread, so access is under lock.
+    encoded_headers_cache_size = 1024
+    _encoded_headers = OrderedDict()
+    _encoded_headers_lock = threading.Lock()
 
     def __init__(self, parent, index, name=''):
         """
@@ -49,9 +60,41 @@ class XenaStream(XenaObject21):
         """
 
         super(self.__class__, self).__init__(objType='stream', index=index, parent=parent, name=name)
+        self._tpld_id = None
+        self._state = None
+        #: Modifiers types (modifier/xmodifier) that were read from the chassis, so stream with no modifiers of these
+        #: types is not queried again.
+        self._discovered = set()
+
+    def set_attributes(self, **attributes):
+        """ Sets list of attributes and keep cached TPLD ID and state in sync.
+
+        :param attributes: dictionary of {attribute: value} to set.
+        """
+        super(self.__class__, self).set_attributes(**attributes)
+        if 'ps_tpldid' in attributes:
+            tpld_id = int(attributes['ps_tpldid'])
+            if tpld_id != self._tpld_id:
+                if self._tpld_id is not None and self._tpld_id >= 0:
+                    self.session.tpld_ids.free(self._tpld_id)
+                if tpld_id >= 0:
+                    self.session.tpld_ids.reserve(tpld_id)
+                self._tpld_id = tpld_id
+        if 'ps_enable' in attributes:
+            self._state = XenaStreamState(attributes['ps_enable'])
+
+    def del_objects_by_type(self, type_):
+        """ Delete all children objects of type, deleted modifiers are discovered again on next access.
+
+        :param type_: type of objects to delete.
+        """
+        super(self.__class__, self).del_objects_by_type(type_)
+        self._discovered.discard(type_)
 
     def del_object_from_parent(self):
         self.send_command('ps_delete')
+        if self._tpld_id is not None and self._tpld_id >= 0:
+            self.session.tpld_ids.free(self._tpld_id)
         super(self.__class__, self).del_object_from_parent()
 
     def set_state(self, state):
@@ -92,32 +135,32 @@ class XenaStream(XenaObject21):
         :param l4_checksum: True - set tcp/udp checksum flag, False - do not set
         """
 
-        body_handler = headers
-        ps_headerprotocol = []
-        while body_handler:
-            segment = pypacker_2_xena.get(str(body_handler).split('(')[0].lower(), None)
-            if not segment:
-                self.logger.warning('pypacker header {} not in conversion list'.
-                                    format(str(body_handler).split('(')[0].lower()))
-                break
-            ps_headerprotocol.append(segment)
-            if type(body_handler) is Ethernet and body_handler.vlan:
-                for _ in range(len(body_handler.vlan)):
-                    ps_headerprotocol.append('vlan')
-            body_handler = body_handler.body_handler
-        if l4_checksum:
-            l4 = headers.upper_layer.upper_layer
-            l4.sum_au_active = False
-            l4.sum = 0
-            if 'udp' in ps_headerprotocol:
-                ps_headerprotocol[ps_headerprotocol.index('udp')] = 'udpcheck'
-            if 'tcp' in ps_headerprotocol:
-                ps_headerprotocol[ps_headerprotocol.index('tcp')] = 'tcpcheck'
-        self.set_attributes(ps_headerprotocol=' '.join(ps_headerprotocol))
+        ps_headerprotocol, ps_packetheader = self._encode_packet_headers(headers, l4_checksum)
+        self.set_attributes(ps_headerprotocol=ps_headerprotocol)
+        self.set_attributes(ps_packetheader=ps_packetheader)
 
-        headers_str = binascii.hexlify(headers.bin())
-        bin_headers = '0x' + headers_str.decode('utf-8')
-        self.set_attributes(ps_packetheader=bin_headers)
+    def preview_packet_headers(self, num_packets=None, seed=0):
+        """ Generate, offline, the sequence of packet headers the stream will transmit, see xena_stream_preview.
+
+        :param num_packets: number of packets to generate. If None - one full cycle of all modifiers.
+        :param seed: random modifiers seed.
+        :return: headers matrix, row per packet.
+        :rtype: numpy.ndarray
+        """
+
+        header = binascii.unhexlify(self.get_attribute('ps_packetheader')[2:])
+        modifiers = (self._get_modifiers_list(XenaModifierType.standard) +
+                     self._get_modifiers_list(XenaModifierType.extended))
+        return modifiers_sequence(header, modifiers, num_packets, seed)
+
+    def get_template(self):
+        """ Capture stream configuration as template for fast cloning, see XenaStreamTemplate.
+
+        :return: stream template.
+        :rtype: xenavalkyrie.xena_stream.XenaStreamTemplate
+        """
+
+        return XenaStreamTemplate(self)
 
     #
     # Modifiers.
@@ -141,44 +184,196 @@ class XenaStream(XenaObject21):
         modifier.set(**kwargs)
         return modifier
 
+    def insert_modifier(self, index, m_type=XenaModifierType.standard, **kwargs):
+        """ Insert modifier, modifiers from index and up are shifted up by one.
+
+        The modifiers count is increased and the new (last) modifier chassis default values are read, as in
+        add_modifier, then the shifted modifiers are set in single pipelined batch.
+
+        :param index: index of the new modifier, 0 <= index <= number of modifiers.
+        :param m_type: modifier type - standard or extended.
+        :param kwargs: modifier values, missing values are the chassis default values of new modifier.
+        :return: newly inserted modifier.
+        :rtype: xenavalkyrie.xena_stream.XenaModifier
+        """
+
+        modifiers = self._get_modifiers_list(m_type)
+        if not 0 <= index <= len(modifiers):
+            raise IndexError('Modifier index {} out of range, stream has {} modifiers'.format(index, len(modifiers)))
+        values = [m.get_values() for m in modifiers[index:]]
+        modifier_class = XenaModifier if m_type == XenaModifierType.standard else XenaXModifier
+        modifiers.append(modifier_class(self, index='{}/{}'.format(self.index, len(modifiers))))
+        modifiers[-1]._create()
+        modifiers[-1].get()
+        new_values = dict(modifiers[-1].get_values(), **kwargs)
+        self._set_modifiers(m_type, None, modifiers[index:], [new_values] + values)
+        return modifiers[index]
+
     def remove_modifier(self, index, m_type=XenaModifierType.standard):
-        """ Remove modifier.
+        """ Remove modifier, modifiers above index are shifted down by one.
 
+        Only the modifiers count and the shifted modifiers are set, in single pipelined batch.
+
+        :param index: index of modifier to remove, 0 <= index < number of modifiers.
         :param m_type: modifier type - standard or extended.
-        :param index: index of modifier to remove.
         """
 
-        if m_type == XenaModifierType.standard:
-            current_modifiers = OrderedDict(self.modifiers)
-            del current_modifiers[index]
+        modifiers = self._get_modifiers_list(m_type)
+        if not 0 <= index < len(modifiers):
+            raise IndexError('Modifier index {} out of range, stream has {} modifiers'.format(index, len(modifiers)))
+        values = [m.get_values() for m in modifiers[index + 1:]]
+        removed_modifier = modifiers.pop()
+        self._set_modifiers(m_type, len(modifiers), modifiers[index:], values)
+        removed_modifier.del_object_from_parent()
 
-            self.set_attributes(ps_modifiercount=0)
-            self.del_objects_by_type('modifier')
+    def update_modifier(self, index, m_type=XenaModifierType.standard, **kwargs):
+        """ Update modifier values in single pipelined batch.
 
-        else:
-            current_modifiers = OrderedDict(self.xmodifiers)
-            del current_modifiers[index]
+        :param index: index of modifier to update.
+        :param m_type: modifier type - standard or extended.
+        :param kwargs: modifier values to update.
+        :return: updated modifier.
+        :rtype: xenavalkyrie.xena_stream.XenaModifier
+        """
+
+        modifier = self._get_modifiers_list(m_type)[index]
+        self._set_modifiers(m_type, None, [modifier], [dict(modifier.get_values(), **kwargs)])
+        return modifier
+
+    #
+    # Private methods.
+    #
 
-            self.set_attributes(ps_modifierextcount=0)
-            self.del_objects_by_type('xmodifier')
+    def _encode_packet_headers(self, headers, l4_checksum=False):
+        """
+        :return: (ps_headerprotocol, ps_packetheader) attributes values for the headers.
+        """
 
-        for modifier in current_modifiers.values():
-            self.add_modifier(m_type,
-                              mask=modifier.mask, action=modifier.action, repeat=modifier.repeat,
-                              min_val=modifier.min_val, step=modifier.step, max_val=modifier.max_val)
+        key = (headers.bin(), l4_checksum)
+        with XenaStream._encoded_headers_lock:
+            encoded = XenaStream._encoded_headers.pop(key, None)
+            if encoded:
+                XenaStream._encoded_headers[key] = encoded
+        if encoded:
+            if l4_checksum:
+                self._clear_l4_checksum(headers)
+            return encoded
+
+        body_handler = headers
+        ps_headerprotocol = []
+        while body_handler:
+            segment = pypacker_2_xena.get(str(body_handler).split('(')[0].lower(), None)
+            if not segment:
+                self.logger.warning('pypacker header {} not in conversion list'.
+                                    format(str(body_handler).split('(')[0].lower()))
+                break
+            ps_headerprotocol.append(segment)
+            if type(body_handler) is Ethernet and body_handler.vlan:
+                for _ in range(len(body_handler.vlan)):
+                    ps_headerprotocol.append('vlan')
+            body_handler = body_handler.body_handler
+        if l4_checksum:
+            self._clear_l4_checksum(headers)
+            if 'udp' in ps_headerprotocol:
+                ps_headerprotocol[ps_headerprotocol.index('udp')] = 'udpcheck'
+            if 'tcp' in ps_headerprotocol:
+                ps_headerprotocol[ps_headerprotocol.index('tcp')] = 'tcpcheck'
+
+        headers_str = binascii.hexlify(headers.bin())
+        encoded = ' '.join(ps_headerprotocol), '0x' + headers_str.decode('utf-8')
+        with XenaStream._encoded_headers_lock:
+            XenaStream._encoded_headers[key] = encoded
+            while len(XenaStream._encoded_headers) > XenaStream.encoded_headers_cache_size:
+                XenaStream._encoded_headers.popitem(last=False)
+        return encoded
+
+    def _set_config(self, attributes, modifiers):
+        """ Set stream cached values and modifiers objects from parsed stream configuration.
+
+        :param attributes: stream attributes, see parse_streams_config.
+        :param modifiers: modifiers attributes, see parse_streams_config.
+        """
+
+        ps_comment = attributes.get('ps_comment', '')
+        if len(ps_comment) >= 2 and ps_comment[0] == '"' and ps_comment[-1] == '"':
+            ps_comment = ps_comment[1:-1]
+        if ps_comment:
+            self._data['name'] = ps_comment
+        self._tpld_id = int(attributes['ps_tpldid']) if attributes.get('ps_tpldid') else -1
+        if 'ps_enable' in attributes:
+            self._state = XenaStreamState(attributes['ps_enable'])
+
+        modifiers_values = OrderedDict()
+        for attribute, mid, value in modifiers:
+            modifier_class = XenaXModifier if 'ext' in attribute else XenaModifier
+            modifiers_values.setdefault((modifier_class, mid), {})[attribute] = value
+        for (modifier_class, mid), values in modifiers_values.items():
+            modifier = modifier_class(self, index='{}/{}'.format(self.index, mid))
+            modifier_command, range_command = modifier._info_config_commands
+            modifier._set_values(values[modifier_command], values.get(range_command))
+        self._discovered.update(('modifier', 'xmodifier'))
+
+    def _get_modifiers_list(self, m_type):
+        modifiers = self.modifiers if m_type == XenaModifierType.standard else self.xmodifiers
+        return [modifiers[index] for index in sorted(modifiers)]
+
+    def _set_modifiers(self, m_type, count, modifiers, values):
+        """ Set modifiers count and modifiers values in single pipelined batch.
+
+        :param count: new modifiers count, None to keep the current count.
+        :param modifiers: list of modifiers to set.
+        :param values: list of {value name: value} per modifier.
+        """
+
+        obj_commands = []
+        if count is not None:
+            count_attribute = 'ps_modifiercount' if m_type == XenaModifierType.standard else 'ps_modifierextcount'
+            obj_commands.append((self, count_attribute, [count]))
+        for modifier, modifier_values in zip(modifiers, values):
+            for name, value in modifier_values.items():
+                setattr(modifier, name, value)
+            obj_commands.extend(modifier._get_set_commands())
+        self.api.send_multi_commands(obj_commands)
+
+    def _clear_l4_checksum(self, headers):
+        l4 = headers.upper_layer.upper_layer
+        l4.sum_au_active = False
+        l4.sum = 0
 
     #
     # Properties.
     #
 
+    @property
+    def tpld_id(self):
+        """
+        :return: stream TPLD ID, -1 if not set. The value is read once and then cached.
+        """
+        if self._tpld_id is None:
+            ps_tpldid = self.get_attribute('ps_tpldid')
+            self._tpld_id = int(ps_tpldid) if ps_tpldid else -1
+        return self._tpld_id
+
+    @property
+    def state(self):
+        """
+        :return: stream state. The value is read once and then cached.
+        :rtype: xenavalkyrie.xena_stream.XenaStreamState
+        """
+        if self._state is None:
+            self._state = XenaStreamState(self.get_attribute('ps_enable'))
+        return self._state
+
     @property
     def modifiers(self):
         """
         :return: dictionary {index: object} of standard modifiers.
         """
-        if not self.get_objects_by_type('modifier'):
-            for index in range(int(self.get_attribute('ps_modifiercount'))):
-                XenaModifier(self, index='{}/{}'.format(self.index, index)).get()
+        if 'modifier' not in self._discovered:
+            if not self.get_objects_by_type('modifier'):
+                for index in range(int(self.get_attribute('ps_modifiercount'))):
+                    XenaModifier(self, index='{}/{}'.format(self.index, index)).get()
+            self._discovered.add('modifier')
         return {s.id: s for s in self.get_objects_by_type('modifier')}
 
     @property
@@ -186,17 +381,93 @@ class XenaStream(XenaObject21):
         """
         :return: dictionary {index: object} of extended modifiers.
         """
-        if not self.get_objects_by_type('xmodifier'):
-            try:
-                for index in range(int(self.get_attribute('ps_modifierextcount'))):
-                    XenaXModifier(self, index='{}/{}'.format(self.index, index)).get()
-            except Exception as _:
-                pass
+        if 'xmodifier' not in self._discovered:
+            if not self.get_objects_by_type('xmodifier'):
+                try:
+                    for index in range(int(self.get_attribute('ps_modifierextcount'))):
+                        XenaXModifier(self, index='{}/{}'.format(self.index, index)).get()
+                except Exception as _:
+                    pass
+            self._discovered.add('xmodifier')
         return {s.id: s for s in self.get_objects_by_type('xmodifier')}
 
 
+class XenaTpldIdAllocator(object):
+    """ Thread safe TPLD IDs allocator - bitmap of used TPLD IDs and extra references count per shared TPLD ID.
+
+    The receiving port identifies streams by TPLD ID, so TPLD IDs must be unique across all ports that send to the same
+    port, on any chassis. There is single allocator per session (XenaSession.tpld_ids), seeded by the ports streams
+    discovery. Each stream holds one reference on its TPLD ID, so ID shared by several streams (on the same port or on
+    different ports) is free only after all these streams are removed.
+
+    Used bit means single reference, so only shared TPLD IDs have entry in the extra references dictionary and
+    reserve/free of IDs range cost is bitmap operations plus one step per shared TPLD ID.
+    """
+
+    def __init__(self):
+        self._used = 0
+        #: {shared TPLD ID: number of references above the first one}
+        self._extra_references = {}
+        self._lock = threading.Lock()
+
+    def allocate(self, max_tid=None):
+        """ Allocate the lowest free TPLD ID.
+
+        :param max_tid: number of TPLD IDs supported by the port (P_CAPABILITIES maxtid). If None - unlimited.
+        :return: allocated TPLD ID, with single reference.
+        """
+
+        with self._lock:
+            tpld_id = (~self._used & (self._used + 1)).bit_length() - 1
+            if max_tid and tpld_id >= max_tid:
+                raise TgnError('No free TPLD ID, all {} TPLD IDs are in use'.format(max_tid))
+            self._used |= 1 << tpld_id
+        return tpld_id
+
+    def reserve(self, first, count=1):
+        """ Add reference to range of TPLD IDs and mark them as used.
+
+        :param first: first TPLD ID to reserve.
+        :param count: number of TPLD IDs to reserve.
+        """
+
+        mask = ((1 << count) - 1) << first
+        with self._lock:
+            shared = self._used & mask
+            while shared:
+                tpld_id = (shared & -shared).bit_length() - 1
+                self._extra_references[tpld_id] = self._extra_references.get(tpld_id, 0) + 1
+                shared &= shared - 1
+            self._used |= mask
+
+    def free(self, first, count=1):
+        """ Remove reference from range of TPLD IDs, TPLD IDs with no references are marked as free.
+
+        :param first: first TPLD ID to free.
+        :param count: number of TPLD IDs to free.
+        :raises TgnError: if any of the TPLD IDs is not reserved.
+        """
+
+        mask = ((1 << count) - 1) << first
+        with self._lock:
+            if mask & ~self._used:
+                raise TgnError('Free of unreserved TPLD IDs {}-{}'.format(first, first + count - 1))
+            for tpld_id in [tpld_id for tpld_id in self._extra_references if first <= tpld_id < first + count]:
+                self._extra_references[tpld_id] -= 1
+                if not self._extra_references[tpld_id]:
+                    del self._extra_references[tpld_id]
+                mask &= ~(1 << tpld_id)
+            self._used &= ~mask
+
+    def is_used(self, tpld_id):
+        return bool(self._used >> tpld_id & 1)
+
+
 class _XenaModifierBase(XenaObject):
 
+    #: Modifier values names.
+    values_names = ('position', 'mask', 'action', 'repeat', 'min_val', 'step', 'max_val')
+
     def __init__(self, objType, parent, index):
         super(_XenaModifierBase, self).__init__(objType=objType, index=index, parent=parent)
 
@@ -212,39 +483,51 @@ class _XenaModifierBase(XenaObject):
     def set(self, **kwargs):
         for k, v in kwargs.items():
             setattr(self, k, v)
-        if type(self) == XenaModifier:
-            self.set_attributes(ps_modifier='{} {} {} {}'.format(self.position, self.mask,
-                                                                 self.action.value, self.repeat))
-        else:
-            self.set_attributes(ps_modifierext='{} {} {} {}'.format(self.position, self.mask,
-                                                                    self.action.value, self.repeat))
-        if self.action != XenaModifierAction.random:
-            if type(self) == XenaModifier:
-                self.set_attributes(ps_modifierrange='{} {} {}'.format(self.min_val, self.step, self.max_val))
-            else:
-                self.set_attributes(ps_modifierextrange='{} {} {}'.format(self.min_val, self.step, self.max_val))
+        for _, command, arguments in self._get_set_commands():
+            self.set_attributes(**{command: arguments[0]})
 
     def get(self):
-        if type(self) == XenaModifier:
-            position, mask, action, repeat = self.get_attribute('ps_modifier').split()
-        else:
-            position, mask, action, repeat = self.get_attribute('ps_modifierext').split()
+        modifier_command, range_command = self._info_config_commands
+        self._set_values(self.get_attribute(modifier_command), self.get_attribute(range_command))
+
+    def get_values(self):
+        """
+        :return: dictionary {value name: value} of modifier values, see values_names.
+        """
+        return dict((name, getattr(self, name, None)) for name in self.values_names)
+
+    #
+    # Private methods.
+    #
+
+    def _set_values(self, modifier_value, range_value=None):
+        """ Set modifier values from modifier and modifier range attributes values. """
+
+        position, mask, action, repeat = modifier_value.split()
         self.position = int(position)
         self.mask = '0x{:x}'.format(int(mask, 16))
         self.action = XenaModifierAction(action)
         self.repeat = int(repeat)
-        if self.action != XenaModifierAction.random:
-            if type(self) == XenaModifier:
-                min_val, step, max_val = self.get_attribute('ps_modifierrange').split()
-            else:
-                min_val, step, max_val = self.get_attribute('ps_modifierextrange').split()
+        if range_value:
+            min_val, step, max_val = range_value.split()
             self.min_val = int(min_val)
             self.step = int(step)
             self.max_val = int(max_val)
 
-    #
-    # Private methods.
-    #
+    def _get_set_commands(self):
+        """
+        :return: list of (object, command, arguments) to set the modifier current values.
+        """
+
+        if type(self) == XenaModifier:
+            modifier_command, range_command = 'ps_modifier', 'ps_modifierrange'
+        else:
+            modifier_command, range_command = 'ps_modifierext', 'ps_modifierextrange'
+        obj_commands = [(self, modifier_command, ['{} {} {} {}'.format(self.position, self.mask, self.action.value,
+                                                                       self.repeat)])]
+        if self.action != XenaModifierAction.random:
+            obj_commands.append((self, range_command, ['{} {} {}'.format(self.min_val, self.step, self.max_val)]))
+        return obj_commands
 
     def _build_index_command(self, command, *arguments):
         module, port, sid, mid = self.index.split('/')
@@ -265,6 +548,8 @@ class _XenaModifierBase(XenaObject):
 class XenaModifier(_XenaModifierBase):
 
     _info_config_commands = ['ps_modifier', 'ps_modifierrange']
+    #: Number of header bytes the modifier modifies.
+    size = 2
 
     def __init__(self, parent, index):
         """
@@ -277,6 +562,8 @@ class XenaModifier(_XenaModifierBase):
 class XenaXModifier(_XenaModifierBase):
 
     _info_config_commands = ['ps_modifierext', 'ps_modifierextrange']
+    #: Number of header bytes the modifier modifies.
+    size = 4
 
     def __init__(self, parent, index):
         """
@@ -286,6 +573,230 @@ class XenaXModifier(_XenaModifierBase):
         super(self.__class__, self).__init__(objType='xmodifier', index=index, parent=parent)
 
 
+class XenaStreamTemplate(object):
+    """ Stream configuration, captured once with single ps_config query, that can be stamped out to many streams.
+
+    Clones are created with XenaBasePort.add_streams so all configuration commands are pipelined. Per clone header
+    fields are patched directly into the template header bytes, no pypacker parsing/serialization per clone.
+    """
+
+    #: Attributes that are set per clone.
+    _clone_attributes = ('ps_comment', 'ps_tpldid', 'ps_enable')
+
+    def __init__(self, stream):
+        """
+        :param stream: source stream.
+        :type stream: xenavalkyrie.xena_stream.XenaStream
+        """
+
+        self.name = stream.name
+        stream_config = parse_streams_config(stream.send_command_return_multilines('ps_config', '?'))
+        #: Stream attributes {attribute: value} and modifiers attributes [(attribute, modifier index, value)], both in
+        #: configuration order.
+        self.attributes, self.modifiers = stream_config.get(stream.id, (OrderedDict(), []))
+        self.state = XenaStreamState(self.attributes.get('ps_enable', XenaStreamState.enabled.value))
+        self.header = bytearray(binascii.unhexlify(self.attributes.get('ps_packetheader', '0x')[2:]))
+        self.fields, self._ip_header = self._get_header_fields()
+
+    def clone(self, port, specs=None, count=1, batch_size=100):
+        """ Create streams from template.
+
+        Each clone spec is a dictionary with optional keys:
+        name - stream description, default template stream description.
+        tpld_id - TPLD ID. If None the a unique value will be set.
+        state - new stream state (xenavalkyrie.xena_stream.XenaStreamState), default template stream state.
+        fields - dictionary {field: value} of header fields to override. Field is one of the template fields (see
+            fields attribute, for example eth.dst, vlan.id, ip.src, udp.dstport) or byte offset in the header, in
+            which case value is the raw bytes to write at the offset. The IPv4 header checksum is recomputed and, if
+            the port does not calculate TCP/UDP checksum (no tcpcheck/udpcheck in ps_headerprotocol), the L4 checksum
+            is updated to match the new addresses and ports.
+        Any other key is stream attribute to override, for example ps_ratepps=1000. ps_packetheader cannot be combined
+            with fields.
+
+        :param port: port to create the streams on, can be the template stream port or any other port.
+        :type port: xenavalkyrie.xena_port.XenaBasePort
+        :param specs: list of clones specs. If None - count clones identical to the template.
+        :param count: number of clones to create if specs is None.
+        :param batch_size: number of streams to create in single write.
+        :return: newly created streams, ordered as specs.
+        :rtype: list of xenavalkyrie.xena_stream.XenaStream
+        """
+
+        streams_specs = []
+        for spec in specs if specs is not None else [{}] * count:
+            spec = dict(spec)
+            streams_spec = OrderedDict([('name', spec.pop('name', self.name)),
+                                        ('tpld_id', spec.pop('tpld_id', None)),
+                                        ('state', spec.pop('state', self.state))])
+            fields = spec.pop('fields', None)
+            if fields and 'ps_packetheader' in spec:
+                raise ValueError('Clone spec cannot set both fields and ps_packetheader')
+            headerprotocol = spec.get('ps_headerprotocol', self.attributes.get('ps_headerprotocol', ''))
+            l4_checksum = re.search('tcpcheck|udpcheck', headerprotocol, re.IGNORECASE) is not None
+            for attribute, value in self.attributes.items():
+                if attribute == 'ps_packetheader' and attribute not in spec:
+                    value = self._patch_header(fields, l4_checksum)
+                if attribute not in self._clone_attributes:
+                    streams_spec[attribute] = spec.pop(attribute, value)
+            streams_spec.update(spec)
+            streams_specs.append(streams_spec)
+        streams = port.add_streams(streams_specs, batch_size)
+
+        if self.modifiers:
+            obj_commands = []
+            for stream in streams:
+                modifiers = {}
+                for attribute, mid, value in self.modifiers:
+                    modifier_class = XenaXModifier if 'ext' in attribute else XenaModifier
+                    if (modifier_class, mid) not in modifiers:
+                        modifiers[(modifier_class, mid)] = modifier_class(stream, '{}/{}'.format(stream.index, mid))
+                    obj_commands.append((modifiers[(modifier_class, mid)], attribute, [value]))
+            commands_per_stream = len(self.modifiers)
+            for start in range(0, len(obj_commands), batch_size * commands_per_stream):
+                port.api.send_multi_commands(obj_commands[start:start + batch_size * commands_per_stream])
+            # Modifiers objects are used only to build the commands, let the streams discover their modifiers.
+            for stream in streams:
+                stream.del_objects_by_type('modifier')
+                stream.del_objects_by_type('xmodifier')
+
+        return streams
+
+    #
+    # Private methods.
+    #
+
+    def _get_header_fields(self):
+        """
+        :return: (fields, IP header) - dictionary {field: (offset, size)} of the template header fields and IP header
+            layout (L3 offset, ether type, IP header length, IP protocol), IP header is None for non IP header.
+        """
+
+        fields = {'eth.dst': (0, 6), 'eth.src': (6, 6)}
+        vlans, ether_type, ip_header_len, proto = packet_layout(bytes(self.header))
+        if vlans:
+            fields['vlan.id'] = (vlans[0], 2)
+        l3 = 14 + 4 * len(vlans)
+        if ether_type == 0x0800 and ip_header_len:
+            fields.update({'ip.src': (l3 + 12, 4), 'ip.dst': (l3 + 16, 4)})
+        elif ether_type == 0x86dd and ip_header_len:
+            fields.update({'ipv6.src': (l3 + 8, 16), 'ipv6.dst': (l3 + 24, 16)})
+        if ip_header_len and proto in (6, 17) and len(self.header) >= l3 + ip_header_len + 4:
+            l4_name = 'udp' if proto == 17 else 'tcp'
+            fields.update({l4_name + '.srcport': (l3 + ip_header_len, 2),
+                           l4_name + '.dstport': (l3 + ip_header_len + 2, 2)})
+        ip_header = (l3, ether_type, ip_header_len, proto) if ip_header_len else None
+        return fields, ip_header
+
+    def _patch_header(self, fields, l4_checksum=False):
+        """
+        :param fields: dictionary {field: value} of header fields to override.
+        :param l4_checksum: True - the port calculates TCP/UDP checksum, False - update the header L4 checksum.
+        :return: ps_packetheader value.
+        """
+
+        if not fields:
+            return '0x' + binascii.hexlify(self.header).decode('utf-8')
+
+        header = bytearray(self.header)
+        for field, value in fields.items():
+            if isinstance(field, int):
+                offset, size = field, len(value)
+                field_bytes = value
+            else:
+                if field not in self.fields:
+                    raise ValueError('Unsupported field {}, template fields - {}'.format(field, sorted(self.fields)))
+                offset, size = self.fields[field]
+                field_bytes = _encode_header_field(field, value, header[offset:offset + size])
+            header[offset:offset + size] = field_bytes
+        if self._ip_header:
+            l3, ether_type, ip_header_len, _ = self._ip_header
+            if ether_type == 0x0800 and header[l3:l3 + ip_header_len] != self.header[l3:l3 + ip_header_len]:
+                header[l3 + 10:l3 + 12] = b'\x00\x00'
+                header[l3 + 10:l3 + 12] = struct.pack('>H', _ip_checksum(header[l3:l3 + ip_header_len]))
+            if not l4_checksum:
+                self._update_l4_checksum(header)
+        return '0x' + binascii.hexlify(header).decode('utf-8')
+
+    def _update_l4_checksum(self, header):
+        """ Update TCP/UDP checksum incrementally (RFC 1624) for the changes in the IP addresses and L4 header.
+
+        The checksum also covers the payload the port adds, so it cannot be computed from the header, only updated.
+        """
+
+        l3, ether_type, ip_header_len, proto = self._ip_header
+        l4 = l3 + ip_header_len
+        checksum_offset = l4 + (16 if proto == 6 else 6)
+        if proto not in (6, 17) or len(header) < checksum_offset + 2:
+            return
+        checksum = struct.unpack_from('>H', self.header, checksum_offset)[0]
+        if proto == 17 and checksum == 0:
+            # UDP checksum is not used.
+            return
+        addresses = slice(l3 + 12, l3 + 20) if ether_type == 0x0800 else slice(l3 + 8, l3 + 40)
+        old_sum, new_sum = [_ones_complement_sum(h[addresses] + h[l4:checksum_offset] + h[checksum_offset + 2:])
+                            for h in (self.header, header)]
+        if old_sum == new_sum:
+            return
+        checksum = ~_ones_complement_sum(struct.pack('>HHH', ~checksum & 0xffff, ~old_sum & 0xffff, new_sum)) & 0xffff
+        if proto == 17 and checksum == 0:
+            checksum = 0xffff
+        struct.pack_into('>H', header, checksum_offset, checksum)
+
+
+def _encode_header_field(field, value, current):
+    """
+    :return: header field bytes for field value.
+    """
+
+    if field.startswith('eth.'):
+        return binascii.unhexlify(re.sub('[:.-]', '', value))
+    if field == 'vlan.id':
+        return struct.pack('>H', (struct.unpack('>H', bytes(current))[0] & 0xf000) | int(value))
+    if field.startswith('ip.'):
+        return socket.inet_aton(value)
+    if field.startswith('ipv6.'):
+        return socket.inet_pton(socket.AF_INET6, value)
+    return struct.pack('>H', int(value))
+
+
+def _ip_checksum(ip_header):
+    return ~_ones_complement_sum(ip_header) & 0xffff
+
+
+def _ones_complement_sum(data):
+    data = bytes(data) + b'\x00' * (len(data) % 2)
+    checksum = sum(struct.unpack('>{}H'.format(len(data) // 2), data))
+    while checksum >> 16:
+        checksum = (checksum & 0xffff) + (checksum >> 16)
+    return checksum
+
+
+def parse_streams_config(lines):
+    """ Parse streams configuration lines, as returned by ps_config and p_fullconfig queries.
+
+    :param lines: configuration lines, non stream lines are ignored.
+    :return: dictionary {stream index: (attributes, modifiers)} in configuration order. attributes is dictionary
+        {attribute: value} and modifiers is list of (attribute, modifier index, value), both in configuration order
+        with lower case attributes names.
+    """
+
+    streams_config = OrderedDict()
+    for line in lines:
+        match = _stream_config_line.match(line.strip())
+        if not match:
+            continue
+        attribute, sid, mid, value = match.groups()
+        attributes, modifiers = streams_config.setdefault(int(sid), (OrderedDict(), []))
+        if mid is not None:
+            modifiers.append((attribute.lower(), int(mid), value))
+        else:
+            attributes[attribute.lower()] = value
+    return streams_config
+
+
+_stream_config_line = re.compile(r'^(?:\S+\s+)?(PS_\w+)\s+\[(\d+)(?:,(\d+))?\]\s*(.*)$', re.IGNORECASE)
+
+
 pypacker_2_xena = {'ethernet': 'ethernet',
                    'arp': 'arp',
                    'ip': 'ip',
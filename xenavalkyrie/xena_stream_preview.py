@@ -0,0 +1,98 @@
+"""
+Offline preview of stream packet headers - apply stream modifiers to the stream header bytes and generate the sequence
+of headers the port will transmit, without running traffic.
+
+The sequence is generated with NumPy as byte matrix (packet x header byte), all modifiers are applied on all packets
+at once so generating millions of headers takes seconds. NumPy is optional dependency, required only for this module.
+
+Modifiers semantics:
+- Modifier value is written to the header bytes at modifier position, only bits set in the mask are modified. The
+  value is aligned to the mask least significant bit, so mask 0x0fff0000 on VLAN tag modifies the VLAN ID.
+- Standard modifiers modify 2 bytes (first two bytes of the mask), extended modifiers modify 4 bytes.
+- Increment modifiers go min, min + step... max, decrement modifiers go max, max - step... min. Each value is repeated
+  repeat times and then the sequence restarts.
+- All modifiers step independently, on each packet.
+- Random modifiers cannot be reproduced, they are filled with pseudo random values (seed is for repeatable preview).
+
+:author: yoram@ignissoft.com
+"""
+
+from functools import reduce
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def sequence_cycle(modifiers):
+    """
+    :param modifiers: list of modifiers (xenavalkyrie.xena_stream.XenaModifier/XenaXModifier).
+    :return: number of packets in one full cycle of all non random modifiers.
+    """
+
+    periods = [_modifier_period(m) for m in modifiers if m.action.value != 'RANDOM']
+    return reduce(_lcm, periods, 1)
+
+
+def modifiers_sequence(header, modifiers, num_packets=None, seed=0):
+    """ Generate the sequence of packet headers.
+
+    :param header: stream header bytes (see XenaStream.get_attribute('ps_packetheader')).
+    :param modifiers: list of modifiers (xenavalkyrie.xena_stream.XenaModifier/XenaXModifier), applied in order.
+    :param num_packets: number of packets to generate. If None - one full cycle, see sequence_cycle.
+    :param seed: random modifiers seed.
+    :return: headers matrix, row per packet.
+    :rtype: numpy.ndarray of uint8 with shape (num_packets, len(header))
+    """
+
+    if np is None:
+        raise ImportError('numpy is required for packet headers preview')
+
+    header = np.frombuffer(bytes(header), dtype=np.uint8)
+    num_packets = num_packets if num_packets is not None else sequence_cycle(modifiers)
+    headers = np.tile(header, (num_packets, 1))
+    packets = np.arange(num_packets, dtype=np.int64)
+    random_state = np.random.RandomState(seed)
+
+    for modifier in modifiers:
+        size = modifier.size
+        position = int(modifier.position)
+        if position + size > len(header):
+            raise ValueError('Modifier position {} out of header length {}'.format(position, len(header)))
+        mask = int(str(modifier.mask), 16) >> (32 - 8 * size)
+        shift = (mask & -mask).bit_length() - 1 if mask else 0
+
+        if modifier.action.value == 'RANDOM':
+            values = random_state.randint(0, (mask >> shift) + 1, size=num_packets, dtype=np.int64)
+        else:
+            steps = packets // int(modifier.repeat) % _modifier_values(modifier)
+            if modifier.action.value == 'INC':
+                values = int(modifier.min_val) + steps * int(modifier.step)
+            else:
+                values = int(modifier.max_val) - steps * int(modifier.step)
+
+        field = np.zeros(num_packets, dtype=np.int64)
+        for i in range(size):
+            field = (field << 8) | headers[:, position + i]
+        field = (field & ~mask) | ((values << shift) & mask)
+        for i in range(size):
+            headers[:, position + i] = (field >> (8 * (size - 1 - i))) & 0xff
+
+    return headers
+
+
+def _modifier_values(modifier):
+    """ Number of distinct values of increment/decrement modifier. """
+    return (int(modifier.max_val) - int(modifier.min_val)) // int(modifier.step) + 1
+
+
+def _modifier_period(modifier):
+    return _modifier_values(modifier) * int(modifier.repeat)
+
+
+def _lcm(a, b):
+    x, y = a, b
+    while y:
+        x, y = y, x % y
+    return a * b // x
@@ -1,9 +1,14 @@
 
 import os
 import sys
-import copy
-
+import threading
 import subprocess
+import warnings
+
+try:
+    from queue import Queue, Full, Empty
+except ImportError:
+    from Queue import Queue, Full, Empty
 
 
 class Tshark:
@@ -11,12 +16,13 @@ class Tshark:
     def __init__(self, ws_path, temp_folder=None):
         """
         :param ws_path: full path to wireshark installation folder.
-        :param temp_folder: folder to save temporary files. If None - use OS 'native' temp folder.
+        :param temp_folder: deprecated and not used - tshark output is read from pipe, no temporary files.
         """
 
         self.ws_path = ws_path
-        if not temp_folder:
-            temp_folder = 'c:/temp' if sys.platform == 'win32' else '/tmp'
+        if temp_folder is not None:
+            warnings.warn('Tshark temp_folder is deprecated and not used', DeprecationWarning, stacklevel=2)
+        #: Deprecated and not used.
         self.temp_folder = temp_folder
 
     def text_to_pcap(self, text_file, pcap_file=None):
@@ -28,16 +34,98 @@ class Tshark:
         subprocess.call(text2pcap_call)
 
     def analyze(self, pcap_file, analyser):
+        """
+        :param pcap_file: pcap file to analyze.
+        :param analyser: analyzer with requested fields and read filter.
+        :type analyser: xenavalkyrie.xena_tshark.TsharkAnalyzer
+        :return: list of {field: list of values} per packet.
+        """
+        return list(self.iter_analyze(pcap_file, analyser))
+
+    def iter_analyze(self, pcap_file, analyser):
+        """ Generator that reads tshark output incrementally from pipe, so memory is bounded for any pcap size.
+
+        :param pcap_file: pcap file to analyze.
+        :param analyser: analyzer with requested fields and read filter.
+        :type analyser: xenavalkyrie.xena_tshark.TsharkAnalyzer
+        :return: {field: list of values} per packet, one packet at a time.
+        """
+
         tshark_path = os.path.join(self.ws_path, 'tshark' + ('.exe' if sys.platform == 'win32' else ''))
         tshark_call = analyser.build_tshark_call(tshark_path, pcap_file)
-        out_file_name = self.temp_folder + '/' + os.path.basename(pcap_file) + '.txt'
-        out_file = open(out_file_name, 'wb')
-        if subprocess.call(tshark_call, stdout=out_file) > 0:
-            raise Exception('{} - failed'.format(' '.join(tshark_call)))
-        out_file.close()
-        fields = analyser.process_out_file(out_file_name)
-        os.remove(out_file_name)
-        return fields
+        tshark = subprocess.Popen(tshark_call, stdout=subprocess.PIPE, universal_newlines=True)
+        try:
+            for line in iter(tshark.stdout.readline, ''):
+                yield analyser.process_line(line)
+            if tshark.wait() > 0:
+                raise Exception('{} - failed'.format(' '.join(tshark_call)))
+        finally:
+            if tshark.poll() is None:
+                tshark.kill()
+                tshark.wait()
+            tshark.stdout.close()
+
+    def iter_analyze_files(self, pcap_files, analyser, processes=4, queue_size=10000):
+        """ Generator that analyzes multiple pcap files with concurrent tshark processes.
+
+        Packets of each file are yielded in file order, packets of different files are interleaved.
+
+        :param pcap_files: list of pcap files to analyze.
+        :param analyser: analyzer with requested fields and read filter.
+        :type analyser: xenavalkyrie.xena_tshark.TsharkAnalyzer
+        :param processes: maximum number of concurrent tshark processes.
+        :param queue_size: maximum number of packets read ahead of the consumer.
+        :return: (pcap file, {field: list of values}) per packet, one packet at a time.
+        """
+
+        files = Queue()
+        for pcap_file in pcap_files:
+            files.put(pcap_file)
+        results = Queue(maxsize=queue_size)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    pass
+            return False
+
+        def analyze_files():
+            while not stop.is_set():
+                try:
+                    pcap_file = files.get_nowait()
+                except Empty:
+                    break
+                packets = self.iter_analyze(pcap_file, analyser)
+                try:
+                    for packet_fields in packets:
+                        if not put((pcap_file, packet_fields)):
+                            break
+                except Exception as e:
+                    put(e)
+                finally:
+                    packets.close()
+            put(None)
+
+        workers = [threading.Thread(target=analyze_files) for _ in range(min(processes, len(pcap_files)))]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        try:
+            running = len(workers)
+            while running:
+                item = results.get()
+                if item is None:
+                    running -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            stop.set()
 
 
 class TsharkAnalyzer:
@@ -76,15 +164,14 @@ class TsharkAnalyzer:
         results_list = results_str.split(self.delimeter)
         return results_list if len(results_list) else [results_str]
 
+    def process_line(self, line):
+        """
+        :param line: single tshark output line.
+        :return: dictionary {field: list of values} of single packet.
+        """
+        fields_values = line.rstrip('\n').split('\t')
+        return {field: self.process_multiple_results(value) for field, value in zip(self.fields, fields_values)}
+
     def process_out_file(self, path):
-        capture_fields = []
-        tsharkin = open(path, "r")
-        for line in tsharkin.readlines():
-            fieldsValues = line.split('\t')
-            packet_fields = {}
-            for i in range(len(self.fields)):
-                result = (copy.copy(fieldsValues[i])).replace('\n', "")
-                result = self.process_multiple_results(result)
-                packet_fields[self.fields[i]] = result
-            capture_fields.append(packet_fields)
-        return capture_fields
+        with open(path, 'r') as tsharkin:
+            return [self.process_line(line) for line in tsharkin]